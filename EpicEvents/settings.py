@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -28,6 +29,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Addresses allowed to scrape /crm/v1/_metrics
+INTERNAL_IPS = ["127.0.0.1"]
+
 
 # Application definition
 
@@ -47,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "crm.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,14 +85,53 @@ WSGI_APPLICATION = "EpicEvents.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# crm.backends.postgresql is the PostgreSQL backend of Django with:
+# - CONN_HEALTH_CHECKS: check a persistent connection before a request
+#   uses it, and reconnect if it is broken.
+# - POOL: e.g. {"max_size": 10, "timeout": 5} to share a pool of at most
+#   max_size connections between the threads of each process, waiting up
+#   to timeout seconds for a free one. Use it with CONN_MAX_AGE = 0 so that
+#   connections go back to the pool at the end of each request.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "crm.backends.postgresql",
         "NAME": "Epic_Events",
         "USER": "postgres",
         "PASSWORD": "postgres",
         "HOST": "localhost",
         "CODE": "5432",
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": None,
+    }
+}
+
+# Set EPIC_EVENTS_DATABASE=sqlite to run locally without PostgreSQL,
+# e.g. for benchmarks.
+if os.environ.get("EPIC_EVENTS_DATABASE") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+
+# Aliases of the DATABASES entries replicating "default". Safe requests of
+# the CRM API read from one of them, except for users who wrote in the last
+# CRM_REPLICA_STICKY_SECONDS, which must exceed the replication lag.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ["crm.routers.ReplicaRouter"]
+CRM_REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Use a shared backend (Memcached, Redis) in production so that every
+# process sees the same cached lists and invalidations.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
@@ -143,9 +187,95 @@ AUTH_USER_MODEL = "accounts.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_FILTER_BACKENDS":
         ("django_filters.rest_framework.DjangoFilterBackend",),
+    "DEFAULT_RENDERER_CLASSES": [
+        "crm.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "crm.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DATETIME_FORMAT": "%Y-%m-%d %H:%M",
 }
+
+# JSON library of the API renderer and parser: "orjson" when installed,
+# falling back to the standard library, or "json" for the latter.
+CRM_JSON_LIBRARY = "orjson"
+
+# Cache of the users authenticated by JWT. Set "shared_cache" to the alias
+# of a CACHES entry to share users between processes.
+AUTH_USER_CACHE = {
+    "max_size": 1024,
+    "ttl": 60,
+    "shared_cache": None,
+}
+
+# Process-local directory of the user roles checked when assigning sales and
+# support contacts. It is reloaded after a user is saved or deleted, and
+# every "ttl" seconds to see the changes made by other processes.
+AUTH_USER_DIRECTORY = {
+    "ttl": 60,
+}
+
+# Keyset pagination of the CRM list endpoints
+CRM_PAGE_SIZE = 50
+CRM_MAX_PAGE_SIZE = 500
+
+# Maximum number of items of the bulk create endpoints
+CRM_BULK_MAX_SIZE = 1000
+
+# Number of rows fetched at a time by the streaming exports
+CRM_EXPORT_CHUNK_SIZE = 2000
+
+# Bytes of an export kept in memory, then on disk, when served under ASGI
+CRM_EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+# Cache of the role-scoped list responses
+CRM_LIST_CACHE = "default"
+CRM_LIST_CACHE_TIMEOUT = 300
+
+# Threads serving the async read-only endpoints under ASGI
+CRM_ASYNC_WORKERS = 16
+
+# Long polls of /crm/v1/async/events/updates/: longest wait in seconds, and
+# seconds between two reads of the change log while waiting, which catch
+# the changes a LocalBroker of another process does not publish.
+CRM_LONG_POLL = {
+    "timeout": 30,
+    "recheck": 5,
+}
+
+# Pub/sub broker waking up the long polls: "crm.broker.LocalBroker" within
+# a process, or "crm.broker.RedisBroker" across processes, with OPTIONS
+# such as {"url": "redis://localhost:6379/0"}.
+CRM_BROKER = {
+    "BACKEND": "crm.broker.LocalBroker",
+    "OPTIONS": {},
+}
+
+# Background jobs run by the run_jobs worker: attempts before a job is
+# marked failed, delay in seconds before the first retry (doubled on each
+# retry) and lease in seconds after which a job left running by a dead
+# worker is run again.
+CRM_JOBS = {
+    "max_attempts": 5,
+    "retry_delay": 10,
+    "lease": 300,
+}
+
+# Per-request instrumentation: share of the requests sampled, number of
+# sampled requests per endpoint kept for the quantiles of /crm/v1/_metrics,
+# and whether to return the timings in a Server-Timing header. Every request
+# is sampled in development; set EPIC_EVENTS_METRICS_SAMPLE_RATE to override
+# the rate, e.g. to 1 for benchmarks.
+CRM_METRICS = {
+    "sample_rate": float(os.environ.get("EPIC_EVENTS_METRICS_SAMPLE_RATE",
+                                        1.0 if DEBUG else 0.01)),
+    "window": 1000,
+    "server_timing": DEBUG,
+}
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "EpicEvents.settings")
 
 application = get_wsgi_application()
+
+from accounts.directory import warm_up  # noqa: E402
+
+warm_up()
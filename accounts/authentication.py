@@ -0,0 +1,104 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Process-local LRU of authenticated users with a time to live,
+    optionally backed by a shared Django cache.
+    """
+
+    key_prefix = "auth-user"
+
+    def __init__(self, max_size=1024, ttl=60, shared_cache=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_cache = shared_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, user_id):
+        return f"{self.key_prefix}:{user_id}"
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                user, expires = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    return user
+                del self._entries[user_id]
+        if self.shared_cache is not None:
+            user = caches[self.shared_cache].get(self.key(user_id))
+            if user is not None:
+                self._store(user_id, user)
+                return user
+        return None
+
+    def set(self, user):
+        self._store(user.pk, user)
+        if self.shared_cache is not None:
+            caches[self.shared_cache].set(self.key(user.pk), user, self.ttl)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self.shared_cache is not None:
+            caches[self.shared_cache].delete(self.key(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+user_cache = UserCache(**getattr(settings, "AUTH_USER_CACHE", {}))
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Adds the role of the user to the claims of the tokens."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["role"] = user.role
+        return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication serving users from the user cache.
+
+    A token whose role claim no longer matches the cached user, e.g.
+    a token issued before a role change, is resolved from the database.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable "
+                               "user identification")
+
+        user = user_cache.get(user_id)
+        if user is None or user.role != validated_token.get("role",
+                                                            user.role):
+            user = super().get_user(validated_token)
+            user_cache.set(user)
+        return copy.copy(user)
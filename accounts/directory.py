@@ -0,0 +1,84 @@
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .models import User
+
+
+class UserDirectory:
+    """
+    Process-local index of the role of every user, loaded in one query and
+    reloaded once invalidated or older than ttl seconds, so that role
+    checks do not query the database.
+    """
+
+    __slots__ = ("ttl", "_roles", "_members", "_expires", "_version",
+                 "_lock")
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._roles = {}
+        self._members = {}
+        self._expires = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Loads the id and role of every user."""
+        with self._lock:
+            version = self._version
+        expires = time.monotonic() + self.ttl
+        roles, members = {}, {}
+        for user_id, role in User.objects.values_list("id", "role"):
+            role = sys.intern(role)
+            roles[user_id] = role
+            members.setdefault(role, []).append(user_id)
+        with self._lock:
+            self._roles = roles
+            self._members = {role: frozenset(ids)
+                             for role, ids in members.items()}
+            # Kept stale when invalidated while loading.
+            self._expires = expires if version == self._version else 0
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._expires = 0
+
+    def role_of(self, user_id):
+        """Role of a user, None when there is no such user."""
+        return self._index()[0].get(user_id)
+
+    def has_role(self, user_id, role):
+        return self.role_of(user_id) == role
+
+    def members(self, role):
+        """Ids of the users of a role."""
+        return self._index()[1].get(role, frozenset())
+
+    def _index(self):
+        if self._expires <= time.monotonic():
+            self.warm()
+        return self._roles, self._members
+
+
+user_directory = UserDirectory(**getattr(settings, "AUTH_USER_DIRECTORY",
+                                         {}))
+
+
+def warm_up():
+    """
+    Warms the directory when the server starts. It loads on the first role
+    check instead when the database is not reachable yet. The connection is
+    closed afterwards: servers preloading the application, such as
+    gunicorn --preload, fork their workers from this process.
+    """
+    try:
+        user_directory.warm()
+    except DatabaseError:
+        pass
+    finally:
+        connections.close_all()
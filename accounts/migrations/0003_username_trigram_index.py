@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS user_username_trgm_idx ON accounts_user "
+        "USING gin (UPPER(username::text) gin_trgm_ops)"
+    )
+
+
+def drop_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS user_username_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_alter_user_is_staff"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .directory import user_directory
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drops a saved or deleted user from the authentication cache."""
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_directory(sender, instance, **kwargs):
+    # Invalidated again on commit, in case another request reloads it from
+    # the rows of before the commit.
+    user_directory.invalidate()
+    transaction.on_commit(user_directory.invalidate)
@@ -0,0 +1,42 @@
+from django.db.models import Avg, Count, DateField, Sum
+from django.db.models.functions import (
+    TruncDay,
+    TruncMonth,
+    TruncQuarter,
+    TruncWeek,
+    TruncYear
+)
+
+DIMENSIONS = ("sales_contact", "client", "status")
+BUCKETS = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+    "quarter": TruncQuarter,
+    "year": TruncYear,
+}
+DATE_FIELDS = ("payment_due", "date_created")
+
+
+def contract_analytics(queryset, dimensions=(), bucket=None,
+                       date_field="payment_due"):
+    """
+    Count, total and average amount of contracts grouped by dimensions and
+    by period of a date field, computed by a single GROUP BY query. Returns
+    a list of rows, a single one when nothing is grouped.
+    """
+    aggregates = {
+        "count": Count("id"),
+        "total_amount": Sum("amount"),
+        "average_amount": Avg("amount"),
+    }
+    group = list(dimensions)
+    queryset = queryset.order_by()
+    if bucket is not None:
+        queryset = queryset.annotate(
+            period=BUCKETS[bucket](date_field, output_field=DateField()))
+        group.append("period")
+    if not group:
+        return [queryset.aggregate(**aggregates)]
+    return list(queryset.values(*group).annotate(**aggregates).order_by(
+        *group))
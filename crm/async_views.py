@@ -0,0 +1,99 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .broker import get_broker, support_channel
+from .metrics import capture_queries
+from .views import (ClientViewSet, ContractViewSet, EventViewSet,
+                    NoteViewSet, poll_timeout)
+
+# Django 3.2 has no asynchronous ORM: the async views hand the blocking
+# work over to a dedicated pool, whose size caps the number of database
+# connections they hold. Under ASGI, the sync views all run on a single
+# thread instead.
+executor = ThreadPoolExecutor(max_workers=settings.CRM_ASYNC_WORKERS,
+                              thread_name_prefix="crm-async")
+
+
+def run_view(view, request, kwargs):
+    close_old_connections()
+    try:
+        with capture_queries():
+            response = view(request, **kwargs)
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def in_executor(view, request, kwargs):
+    loop = asyncio.get_running_loop()
+    # Runs in a copy of the context to keep the request metrics.
+    context = contextvars.copy_context()
+    return loop.run_in_executor(executor, context.run, run_view, view,
+                                request, kwargs)
+
+
+def async_view(view):
+    """
+    Wraps a read-only DRF view into a native async view, so that an ASGI
+    server awaits it on its event loop instead of running it through
+    sync_to_async.
+    """
+    async def wrapper(request, **kwargs):
+        return await in_executor(view, request, kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def polled(response):
+    """Whether a read of the long poll answers the request."""
+    return response.status_code != 200 or response.data["results"]
+
+
+async def poll(view, request):
+    """
+    Long poll of the event updates, whose reads run on the pool but which
+    awaits the broker on the event loop, holding no thread meanwhile.
+    """
+    response = await in_executor(view, request, {})
+    if polled(response):
+        return response
+    # Valid once read by the view, which also authenticated the user.
+    timeout = poll_timeout(request.GET)
+    request.GET = request.GET.copy()
+    request.GET["since"] = str(response.data["since"])
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    channel = support_channel(request.user.id)
+    with get_broker().subscribe(channel, loop) as subscription:
+        while True:
+            response = await in_executor(view, request, {})
+            remaining = deadline - loop.time()
+            if polled(response) or remaining <= 0:
+                return response
+            await subscription.aget(min(remaining,
+                                        settings.CRM_LONG_POLL["recheck"]))
+
+
+client_list = async_view(ClientViewSet.as_view({"get": "list"}))
+client_detail = async_view(ClientViewSet.as_view({"get": "retrieve"}))
+contract_list = async_view(ContractViewSet.as_view({"get": "list"}))
+contract_detail = async_view(ContractViewSet.as_view({"get": "retrieve"}))
+event_list = async_view(EventViewSet.as_view({"get": "list"}))
+event_detail = async_view(EventViewSet.as_view({"get": "retrieve"}))
+note_list = async_view(NoteViewSet.as_view({"get": "list"}))
+note_detail = async_view(NoteViewSet.as_view({"get": "retrieve"}))
+event_update_view = EventViewSet.as_view({"get": "updates"})
+
+
+async def event_updates(request):
+    return await poll(event_update_view, request)
+
+
+event_updates.csrf_exempt = True
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import Counter
+
+# Pools of the process by database alias, and the physical connections
+# opened by alias, pooled or not.
+pools = {}
+pools_lock = threading.Lock()
+opened = Counter()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections shared by the threads of a
+    process. A thread waits up to `timeout` seconds for a connection when
+    `max_size` connections are in use.
+    """
+
+    def __init__(self, max_size=10, timeout=5):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle = []
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+
+    def available(self):
+        return bool(self.idle) or self.in_use < self.max_size
+
+    def acquire(self, connect, check=None):
+        """
+        Returns an idle connection that passes `check`, or a new connection
+        made by `connect`.
+        """
+        started = time.perf_counter()
+        with self.condition:
+            if not self.available():
+                self.waits += 1
+                while not self.available():
+                    remaining = started + self.timeout - time.perf_counter()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        self.wait_seconds += self.timeout
+                        raise PoolTimeout(
+                            f"No connection available after {self.timeout}s "
+                            f"({self.max_size} in use).")
+                    self.condition.wait(remaining)
+                self.wait_seconds += time.perf_counter() - started
+            self.in_use += 1
+            connection = self.idle.pop() if self.idle else None
+
+        try:
+            if (connection is not None and check is not None
+                    and not check(connection)):
+                self.discard(connection)
+                connection = None
+            if connection is None:
+                connection = connect()
+        except BaseException:
+            self.release(None)
+            raise
+        return connection
+
+    def release(self, connection):
+        """Gives a connection back, None when it was discarded."""
+        with self.condition:
+            self.in_use -= 1
+            if connection is not None:
+                self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "in_use": self.in_use,
+                "idle": len(self.idle),
+                "max_size": self.max_size,
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "timeouts": self.timeouts,
+            }
+
+
+def get_pool(alias, options):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = ConnectionPool(**options)
+        return pools[alias]
+
+
+def close_idle():
+    """Closes the idle connections of every pool of the process."""
+    with pools_lock:
+        process_pools = list(pools.values())
+    for pool in process_pools:
+        pool.close_idle()
+
+
+# Forked processes, such as the workers of a preloading server, must not
+# share the idle connections of their parent.
+os.register_at_fork(before=close_idle)
@@ -0,0 +1,99 @@
+from functools import partial
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from ..pool import PoolTimeout, get_pool, opened
+
+Database = base.Database
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend adding two settings to the DATABASES entry:
+
+    - CONN_HEALTH_CHECKS: checks that a persistent connection still works
+      before its first use by a request, and reconnects if it does not.
+    - POOL: {"max_size": ..., "timeout": ...} to borrow the connections
+      from a pool shared by the threads of the process, and give them back
+      instead of closing them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.connection_pool = None
+
+    def health_checks(self):
+        return self.settings_dict.get("CONN_HEALTH_CHECKS", False)
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict.get("POOL")
+        if not options:
+            opened[self.alias] += 1
+            return super().get_new_connection(conn_params)
+
+        pool = get_pool(self.alias, options)
+        check = self.check_pooled if self.health_checks() else None
+        try:
+            connection = pool.acquire(
+                partial(self.open_pooled, conn_params), check)
+        except PoolTimeout as error:
+            raise Database.OperationalError(str(error)) from error
+        self.connection_pool = pool
+        self.isolation_level = connection.isolation_level
+        return connection
+
+    def open_pooled(self, conn_params):
+        opened[self.alias] += 1
+        return super().get_new_connection(conn_params)
+
+    def check_pooled(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            # Ends the transaction the check began outside autocommit, which
+            # would keep Django from setting the autocommit mode.
+            connection.rollback()
+        except Database.Error:
+            return False
+        return True
+
+    def connect(self):
+        super().connect()
+        # A pooled connection was checked when it was borrowed.
+        self.health_check_done = True
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and self.health_checks()):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        # Called at the start and end of every request.
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def _close(self):
+        pool, self.connection_pool = self.connection_pool, None
+        if pool is None:
+            return super()._close()
+        connection = self.connection
+        status = (extensions.TRANSACTION_STATUS_UNKNOWN if connection.closed
+                  else connection.info.transaction_status)
+        try:
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                raise Database.InterfaceError("connection lost")
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            # Given back in autocommit mode, in which checks begin no
+            # transaction.
+            connection.autocommit = True
+        except Database.Error:
+            pool.discard(connection)
+            pool.release(None)
+        else:
+            pool.release(connection)
@@ -0,0 +1,146 @@
+import asyncio
+import collections
+import functools
+import json
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+def support_channel(user_id):
+    """Channel of the event updates of a support contact."""
+    return f"support:{user_id}"
+
+
+class Subscription:
+    """
+    Messages published to a channel since the subscription, awaited by a
+    coroutine of loop with aget().
+    """
+
+    def __init__(self, broker, channel, loop):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.messages = collections.deque()
+        self.ready = asyncio.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def deliver(self, message):
+        """Adds a message, from any thread."""
+        self.messages.append(message)
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # The loop of the subscriber is closed.
+            pass
+
+    def drain(self):
+        # Cleared first, so that a message delivered meanwhile is either
+        # drained or sets the event again.
+        self.ready.clear()
+        messages = []
+        while self.messages:
+            messages.append(self.messages.popleft())
+        return messages
+
+    async def aget(self, timeout):
+        """Messages delivered, waiting up to timeout seconds for one."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.drain()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    Publishes messages to the subscribers of the current process only.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, channel, loop):
+        subscription = Subscription(self, channel, loop)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        """Delivers a message to the subscribers of this process."""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Publishes messages to the subscribers of every process through Redis
+    pub/sub. A thread of each subscribing process relays the messages of
+    Redis to its local subscribers.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", prefix="crm:"):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requires the redis "
+                                       "package.")
+        self.redis = redis.Redis.from_url(url)
+        self.errors = redis.RedisError
+        self.prefix = prefix
+        self.listener = None
+
+    def subscribe(self, channel, loop):
+        with self.lock:
+            if self.listener is None:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(**{f"{self.prefix}*": self.relay})
+                self.listener = pubsub.run_in_thread(sleep_time=1,
+                                                     daemon=True)
+        return super().subscribe(channel, loop)
+
+    def publish(self, channel, message):
+        try:
+            self.redis.publish(self.prefix + channel, json.dumps(message))
+        except self.errors:
+            # Messages only wake up subscribers, which also read the change
+            # log at intervals.
+            pass
+
+    def relay(self, message):
+        channel = message["channel"].decode()[len(self.prefix):]
+        self.deliver(channel, json.loads(message["data"]))
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    """Broker of CRM_BROKER, created once per process."""
+    options = settings.CRM_BROKER
+    return import_string(options["BACKEND"])(**options.get("OPTIONS", {}))
@@ -0,0 +1,109 @@
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+from .routers import replica
+
+RESOURCES = ("clients", "contracts", "events", "notes")
+
+
+class ListCache:
+    """
+    Cache of the serialized pages of the role-scoped lists.
+
+    Keys embed the version of the namespaces the page depends on: one per
+    resource for the unscoped lists of Management members, one per resource
+    and Sales or Support contact for their scoped lists, and one per user.
+    Bumping a version makes every key built on it unreachable; the stale
+    entries then expire on their own.
+    """
+
+    prefix = "crm-list"
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def scope(self, user):
+        if user.role in ("sales", "support"):
+            return f"user:{user.id}"
+        return "all"
+
+    def version_key(self, namespace, scope):
+        return f"{self.prefix}:version:{namespace}:{scope}"
+
+    def versions(self, keys):
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # A lost version must never fall back to an older value.
+                self.cache.add(key, time.time_ns(), timeout=None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def key(self, request, resource):
+        user = request.user
+        scope = self.scope(user)
+        version_keys = [self.version_key(resource, scope)]
+        if scope != "all":
+            version_keys.append(self.version_key("user", user.id))
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        raw = ":".join(str(part) for part in (
+            resource, scope, *self.versions(version_keys),
+            request.get_host(), request.path, params,
+        ))
+        return f"{self.prefix}:{hashlib.md5(raw.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        timeout = self.timeout
+        if replica.get() is not None:
+            # A page read from a lagging replica may miss the write that
+            # invalidated the previous one: keep it no longer than the lag.
+            timeout = min(timeout, settings.CRM_REPLICA_STICKY_SECONDS)
+        self.cache.set(key, value, timeout)
+
+    def bump(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), timeout=None)
+
+    def bump_all(self, keys):
+        for key in keys:
+            self.bump(key)
+
+    def invalidate_keys(self, keys):
+        # Bumped again once committed: a page read before the commit is
+        # cached under the first version.
+        self.bump_all(keys)
+        transaction.on_commit(partial(self.bump_all, keys))
+
+    def invalidate(self, resources, user_ids=()):
+        """Invalidates the lists of resources seen by Management and users."""
+        keys = []
+        for resource in resources:
+            keys.append(self.version_key(resource, "all"))
+            for user_id in set(user_ids):
+                if user_id is not None:
+                    keys.append(self.version_key(resource, f"user:{user_id}"))
+        self.invalidate_keys(keys)
+
+    def invalidate_user(self, user_id):
+        """Invalidates every list cached for a user."""
+        self.invalidate_keys([self.version_key("user", user_id)])
+
+
+list_cache = ListCache(settings.CRM_LIST_CACHE,
+                       settings.CRM_LIST_CACHE_TIMEOUT)
@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Max
+
+from .export import CONTENT_TYPES, ndjson_rows, streaming_response
+from .models import Change, ChangeSequence, Client, Contract, Event, Note
+from .serializers import (
+    ClientSerializer,
+    ContractSerializer,
+    EventSerializer,
+    NoteChangeSerializer
+)
+
+# Resource name and serializer of the data of each logged model.
+RESOURCES = {
+    Client: ("clients", ClientSerializer),
+    Contract: ("contracts", ContractSerializer),
+    Event: ("events", EventSerializer),
+    Note: ("notes", NoteChangeSerializer),
+}
+
+# Field of the contact a row is assigned to, for the models which have one.
+CONTACT_FIELDS = {
+    Client: "sales_contact_id",
+    Contract: "sales_contact_id",
+    Event: "support_contact_id",
+}
+
+
+def audience(instance):
+    """Sales and support contacts in charge of a row, as a pair."""
+    if isinstance(instance, (Client, Contract)):
+        return instance.sales_contact_id, None
+    if isinstance(instance, Event):
+        sales_id = Client.objects.filter(id=instance.client_id).values_list(
+            "sales_contact_id", flat=True).first()
+        return sales_id, instance.support_contact_id
+    contacts = Event.objects.filter(id=instance.event_id).values_list(
+        "client__sales_contact_id", "support_contact_id").first()
+    return contacts or (None, None)
+
+
+def entry(instance, action, contacts=None):
+    """Unsaved change log entry of an action on a row."""
+    resource, serializer_class = RESOURCES[type(instance)]
+    sales_id, support_id = contacts or audience(instance)
+    contact_field = CONTACT_FIELDS.get(type(instance))
+    previous_id = None
+    if action == Change.UPDATE and contact_field is not None:
+        previous_id = getattr(instance, "_previous_contact_id", None)
+        if previous_id == getattr(instance, contact_field):
+            previous_id = None
+    return Change(
+        resource=resource,
+        object_id=instance.pk,
+        action=action,
+        data=(None if action == Change.DELETE
+              else serializer_class(instance).data),
+        sales_contact_id=sales_id,
+        support_contact_id=support_id,
+        previous_contact_id=previous_id,
+    )
+
+
+def record(instance, action, contacts=None):
+    entry(instance, action, contacts).save()
+    sequence_on_commit()
+
+
+def record_created(objs, contacts=None):
+    """
+    Logs the rows saved by bulk_create(), which sends no signal. Call it in
+    the transaction of the insert.
+    """
+    if not objs:
+        return
+    if objs[0].pk is None:
+        # The database returned no ids, which SQLite does not. It lets one
+        # transaction write at a time: the rows just inserted are the last.
+        ids = type(objs[0]).objects.order_by("-pk").values_list(
+            "pk", flat=True)[:len(objs)]
+        for obj, pk in zip(objs, reversed(list(ids))):
+            obj.pk = pk
+    Change.objects.bulk_create([entry(obj, Change.CREATE, contacts)
+                                for obj in objs])
+    sequence_on_commit()
+
+
+def sequence():
+    """
+    Gives a sequence number to the committed changes which have none. A
+    round numbers them after every change numbered by the previous rounds,
+    in id order and without gaps, so that a transaction committing after a
+    later one cannot have its changes skipped by a consumer already past
+    the later ones.
+    """
+    with transaction.atomic():
+        # Locks the counter: one round runs at a time.
+        if not ChangeSequence.objects.filter(id=1).update(last=F("last")):
+            ChangeSequence.objects.get_or_create(id=1, defaults={
+                "last": Change.objects.aggregate(last=Max("seq"))["last"]
+                or 0})
+        last = ChangeSequence.objects.values_list("last", flat=True).get(
+            id=1)
+        ids = list(Change.objects.filter(seq=None).order_by("id")
+                   .values_list("id", flat=True))
+        if not ids:
+            return
+        # Each run of consecutive ids is numbered by one update, so that
+        # ids committed in a later round leave no gap.
+        for first, end in runs(ids):
+            offset = last + 1 - first
+            Change.objects.filter(seq=None, id__gte=first,
+                                  id__lte=end).update(seq=F("id") + offset)
+            last = end + offset
+        ChangeSequence.objects.filter(id=1).update(last=last)
+
+
+def runs(ids):
+    """First and last id of each run of consecutive ids, in id order."""
+    start = previous = None
+    for current in ids:
+        if previous is None or current != previous + 1:
+            if start is not None:
+                yield start, previous
+            start = current
+        previous = current
+    if start is not None:
+        yield start, previous
+
+
+def sequence_safely():
+    try:
+        sequence()
+    except DatabaseError:
+        # The changes are numbered by the round of the next commit.
+        pass
+
+
+def sequence_on_commit():
+    """Numbers the changes of the current transaction once committed."""
+    if not any(func is sequence_safely
+               for _, func in connection.run_on_commit):
+        transaction.on_commit(sequence_safely)
+
+
+def pending(queryset, since, limit=None):
+    """
+    Numbered changes of a queryset after the sequence number since, in
+    sequence order.
+    """
+    queryset = queryset.filter(seq__gt=since)
+    queryset = queryset.order_by("seq").using(queryset.db)
+    if limit is not None:
+        queryset = queryset[:limit]
+    return queryset
+
+
+def change_rows(queryset):
+    """Changes of a queryset as the dicts served to the consumers."""
+    fields = ("seq", "resource", "object_id", "action", "data",
+              "date_created")
+    return (
+        {"seq": seq, "resource": resource, "id": object_id,
+         "action": action, "data": data, "date": date}
+        for seq, resource, object_id, action, data, date
+        in queryset.values_list(*fields).iterator(
+            chunk_size=settings.CRM_EXPORT_CHUNK_SIZE)
+    )
+
+
+def stream_changes(request, queryset, since, limit=None):
+    """
+    Streams the numbered changes of a queryset after the sequence number
+    since, as NDJSON.
+    """
+    rows = change_rows(pending(queryset, since, limit))
+    return streaming_response(request, ndjson_rows(rows),
+                              CONTENT_TYPES["ndjson"])
@@ -0,0 +1,138 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as drf_fields
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import ISO_8601, api_settings
+
+from .fieldsets import readable_fields
+
+# Fields whose representation of a database value is the value itself.
+PASSTHROUGH_FIELDS = (drf_fields.BooleanField, drf_fields.CharField,
+                      drf_fields.FloatField, drf_fields.IntegerField)
+
+
+class NotCompilable(Exception):
+    """A serializer field is not a plain column of its model."""
+
+
+def column_of(model, field):
+    """Column of the model read by a serializer field."""
+    source = field.source
+    if source == "*" or "." in source:
+        raise NotCompilable(field.field_name)
+    try:
+        model_field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        raise NotCompilable(field.field_name)
+    if not model_field.concrete or model_field.many_to_many:
+        raise NotCompilable(field.field_name)
+    if model_field.is_relation and not isinstance(field,
+                                                  PrimaryKeyRelatedField):
+        raise NotCompilable(field.field_name)
+    return source
+
+
+class DateTimeConverter:
+    """
+    Formats datetimes like a DateTimeField does, looking up the timezone to
+    convert them to once per rendering instead of once per value.
+    """
+
+    def __init__(self, field, output_format):
+        self.field = field
+        self.output_format = output_format
+
+    def bind(self):
+        field, output_format = self.field, self.output_format
+        field_timezone = getattr(field, "timezone", field.default_timezone())
+
+        def convert(value):
+            if field_timezone is None or value.tzinfo is None:
+                value = field.enforce_timezone(value)
+            else:
+                value = value.astimezone(field_timezone)
+            return value.strftime(output_format)
+
+        return convert
+
+
+def converter_of(field):
+    """
+    Function turning a non-NULL column value into the representation of the
+    field, None when the value is its own representation.
+    """
+    if isinstance(field, PrimaryKeyRelatedField):
+        # values_list() reads the primary key of the related row.
+        if field.pk_field is None:
+            return None
+        return field.pk_field.to_representation
+    if isinstance(field, drf_fields.DateTimeField):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        if output_format is None or output_format.lower() == ISO_8601:
+            return field.to_representation
+        return DateTimeConverter(field, output_format)
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    return field.to_representation
+
+
+class CompiledSerializer:
+    """
+    Read-only rendering of the fields of a ModelSerializer, compiled once per
+    serializer class: rows of queryset.values_list(*columns) are turned into
+    the same representation as the serializer gives of the instances,
+    without building model instances nor walking the serializer fields.
+    """
+
+    def __init__(self, serializer_class, names):
+        model = serializer_class.Meta.model
+        fields = serializer_class().fields
+        self.names = tuple(names)
+        self.columns = tuple(column_of(model, fields[name])
+                             for name in self.names)
+        converters = [converter_of(fields[name]) for name in self.names]
+        self.converters = tuple((index, convert)
+                                for index, convert in enumerate(converters)
+                                if convert is not None)
+
+    def represent(self, rows):
+        """
+        Yields the representation of each row. Columns after those of the
+        serializer, such as the ordering of a cursor, are left out.
+        """
+        names = self.names
+        converters = [
+            (index, convert.bind() if isinstance(convert, DateTimeConverter)
+             else convert)
+            for index, convert in self.converters
+        ]
+        width = len(names)
+        for row in rows:
+            values = list(row[:width])
+            for index, convert in converters:
+                value = values[index]
+                if value is not None:
+                    values[index] = convert(value)
+            yield dict(zip(names, values))
+
+    def render(self, rows):
+        return list(self.represent(rows))
+
+
+@lru_cache(maxsize=None)
+def _compile(serializer_class, names):
+    try:
+        return CompiledSerializer(
+            serializer_class,
+            names or readable_fields(serializer_class))
+    except NotCompilable:
+        return None
+
+
+def compile_serializer(serializer_class, fields=None):
+    """
+    Compiled rendering of the given fields of a serializer, or of all of
+    them, None when a field is not a plain column of the model.
+    """
+    return _compile(serializer_class, tuple(fields or ()))
@@ -0,0 +1,46 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    key = ":".join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(key.encode("utf-8")).hexdigest())
+
+
+def detail_validators(obj):
+    """ETag and Last-Modified timestamp of an object, from date_updated."""
+    etag = make_etag(obj._meta.label, obj.pk, obj.date_updated.isoformat())
+    return etag, int(obj.date_updated.timestamp())
+
+
+def list_validators(request, data):
+    """
+    ETag of a page of a scoped list, from its rendered content, so that
+    it costs no query and catches every change of the page rows.
+
+    Lists do not send Last-Modified: deleting a row does not move the most
+    recent date_updated, so only the ETag catches it.
+    """
+    return make_etag(request.user.id, hashlib.md5(data).hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """Returns a 304 response when the client copy is still fresh."""
+    if etag is None and last_modified is None:
+        return None
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is not None:
+        patch_vary_headers(response, ("Authorization",))
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    if etag is not None:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_vary_headers(response, ("Authorization",))
+    return response
@@ -91,3 +91,12 @@ class ObsoleteDate(APIException):
         "Please choose another date in the future."
     )
     default_code = "obsolete_date"
+
+
+class InvalidBulkPayload(APIException):
+    status_code = 400
+    default_detail = (
+        "Bulk requests expect a non-empty list of items. "
+        "Please split larger batches."
+    )
+    default_code = "invalid_bulk_payload"
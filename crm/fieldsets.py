@@ -0,0 +1,34 @@
+from rest_framework.exceptions import ValidationError
+
+SUMMARY_VIEW = "summary"
+
+
+def readable_fields(serializer_class):
+    """Names of the fields a serializer outputs, in output order."""
+    return [name for name, field in serializer_class().fields.items()
+            if not field.write_only]
+
+
+def requested_fields(request, serializer_class):
+    """
+    Fields asked by ?fields=a,b or by ?view=summary, in output order, None
+    to output every field.
+    """
+    params = request.query_params
+    view, names = params.get("view"), params.get("fields")
+    if view is None and not names:
+        return None
+
+    available = readable_fields(serializer_class)
+    if names:
+        names = set(name for name in names.split(",") if name)
+        unknown = sorted(names - set(available))
+        if unknown:
+            raise ValidationError({"fields": [
+                f"Unknown fields: {', '.join(unknown)}. Choose among: "
+                f"{', '.join(available)}."]})
+    elif view == SUMMARY_VIEW:
+        names = set(serializer_class.Meta.summary_fields)
+    else:
+        raise ValidationError({"view": [f"Choose one of: {SUMMARY_VIEW}."]})
+    return [name for name in available if name in names]
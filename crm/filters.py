@@ -2,6 +2,7 @@ from django_filters import rest_framework as filters
 
 from accounts.models import User
 from crm.models import Client, Contract, Event, Note
+from crm.search import full_text_search, trigram_search
 
 
 class UserFilter(filters.FilterSet):
@@ -9,10 +10,15 @@ class UserFilter(filters.FilterSet):
 
     username_contains = filters.CharFilter(field_name="username",
                                            lookup_expr="icontains")
+    search = filters.CharFilter(method="search_users")
 
     class Meta:
         model = User
-        fields = ["username", "role", "username_contains"]
+        fields = ["username", "role", "username_contains", "search"]
+
+    def search_users(self, queryset, name, value):
+        return trigram_search(queryset, ["username"], value).order_by(
+            "-search_rank", "username")
 
 
 class ClientFilter(filters.FilterSet):
@@ -28,20 +34,31 @@ class ClientFilter(filters.FilterSet):
                                              lookup_expr="icontains")
     company = filters.CharFilter(field_name="company",
                                  lookup_expr="iexact")
+    search = filters.CharFilter(method="search_clients")
 
     class Meta:
         model = Client
         fields = ["first_name", "first_name__contains",
                   "last_name__contains", "last_name",
-                  "company", "sales_contact"]
+                  "company", "sales_contact", "search"]
+
+    def search_clients(self, queryset, name, value):
+        return trigram_search(queryset,
+                              ["first_name", "last_name", "company"], value)
 
 
 class ContractFilter(filters.FilterSet):
     """Implements filters to be used with ContractViewSet."""
 
+    payment_due_after = filters.DateTimeFilter(field_name="payment_due",
+                                               lookup_expr="gte")
+    payment_due_before = filters.DateTimeFilter(field_name="payment_due",
+                                                lookup_expr="lt")
+
     class Meta:
         model = Contract
-        fields = ["status", "client", "sales_contact"]
+        fields = ["status", "client", "sales_contact", "payment_due_after",
+                  "payment_due_before"]
 
 
 class EventFilter(filters.FilterSet):
@@ -57,7 +74,11 @@ class NoteFilter(filters.FilterSet):
 
     description__contains = filters.CharFilter(field_name="description",
                                                lookup_expr="icontains")
+    search = filters.CharFilter(method="search_notes")
 
     class Meta:
         model = Note
-        fields = ["description__contains"]
+        fields = ["description__contains", "search"]
+
+    def search_notes(self, queryset, name, value):
+        return full_text_search(queryset, "description", value)
@@ -0,0 +1,109 @@
+import datetime
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Client, Event, Job
+
+# Function run by the jobs of each name.
+handlers = {}
+
+
+def job(name):
+    """Registers the decorated function as the handler of a job name."""
+    def register(function):
+        handlers[name] = function
+        return function
+    return register
+
+
+def enqueue(name, **payload):
+    """
+    Saves a job to run once committed. Call it in the transaction of the
+    change the job follows, so that both are saved or neither is.
+    """
+    return Job.objects.create(name=name, payload=payload)
+
+
+def enqueue_many(name, payloads):
+    return Job.objects.bulk_create([Job(name=name, payload=payload)
+                                    for payload in payloads])
+
+
+def runnable(now):
+    """
+    Jobs due to run: pending ones, and running ones whose worker died
+    before the end of its lease.
+    """
+    return (Q(status=Job.PENDING, run_after__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now))
+
+
+def claim(limit):
+    """
+    Ids of up to limit runnable jobs, leased to the calling worker. Each job
+    is taken by a conditional UPDATE, so that concurrent workers never
+    claim the same job.
+    """
+    now = timezone.now()
+    lease = datetime.timedelta(seconds=settings.CRM_JOBS["lease"])
+    candidates = Job.objects.filter(runnable(now)).order_by(
+        "run_after", "id").values_list("id", flat=True)[:limit]
+    return [
+        job_id for job_id in list(candidates)
+        if Job.objects.filter(runnable(now), id=job_id).update(
+            status=Job.RUNNING, locked_until=now + lease,
+            attempts=F("attempts") + 1)
+    ]
+
+
+def run(job_id):
+    """
+    Runs a claimed job in a transaction which deletes it on success. On
+    failure, the job is retried later with an exponential backoff, until
+    it runs out of attempts. Returns whether the job succeeded.
+    """
+    job = Job.objects.filter(id=job_id, status=Job.RUNNING).first()
+    if job is None:
+        return False
+    try:
+        with transaction.atomic():
+            handlers[job.name](**job.payload)
+            job.delete()
+    except Exception:
+        options = settings.CRM_JOBS
+        update = {"locked_until": None,
+                  "last_error": traceback.format_exc()}
+        if job.attempts >= options["max_attempts"]:
+            update["status"] = Job.FAILED
+        else:
+            delay = options["retry_delay"] * 2 ** (job.attempts - 1)
+            update["status"] = Job.PENDING
+            update["run_after"] = timezone.now() + datetime.timedelta(
+                seconds=delay)
+        Job.objects.filter(id=job.id).update(**update)
+        return False
+    return True
+
+
+def run_in_worker(job_id):
+    """Runs a job on a thread or process of a worker pool."""
+    close_old_connections()
+    try:
+        return run(job_id)
+    finally:
+        close_old_connections()
+
+
+@job("contract_signed")
+def contract_signed(contract_id, client_id):
+    """
+    Creates the placeholder event of the client of a signed contract. The
+    event only depends on the client: contract_id is kept in the payload
+    to trace the job back to its contract.
+    """
+    if Client.objects.filter(id=client_id).exists():
+        Event.objects.create(client_id=client_id, attendees=0)
@@ -0,0 +1,457 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.authentication import RoleTokenObtainPairSerializer
+from accounts.models import User
+from crm.metrics import RequestMetrics, current
+from crm.models import Client, Contract, Event, Note
+
+MANAGEMENT = ("management",)
+SALES = ("management", "sales")
+SUPPORT = ("management", "support")
+EVERYONE = ("management", "sales", "support")
+SUPPORT_ONLY = ("support",)
+
+# Name: (weight, roles allowed to call the endpoint)
+WORKLOAD = {
+    "login": (1, EVERYONE),
+    "login-refresh": (1, EVERYONE),
+    "clients-list": (14, EVERYONE),
+    "clients-search": (4, EVERYONE),
+    "clients-detail": (8, EVERYONE),
+    "clients-export": (1, EVERYONE),
+    "clients-summary": (2, SALES),
+    "clients-create": (1, SALES),
+    "clients-update": (2, SALES),
+    "clients-bulk": (1, SALES),
+    "contracts-list": (8, SALES),
+    "contracts-detail": (5, SALES),
+    "contracts-export": (1, SALES),
+    "contracts-analytics": (1, SALES),
+    "contracts-create": (1, SALES),
+    "contracts-update": (1, SALES),
+    "contracts-bulk": (1, SALES),
+    "events-list": (14, EVERYONE),
+    "events-detail": (8, EVERYONE),
+    "events-export": (1, EVERYONE),
+    "events-updates": (3, SUPPORT_ONLY),
+    "events-update": (2, SUPPORT),
+    "events-destroy": (1, SUPPORT),
+    "notes-list": (6, EVERYONE),
+    "notes-search": (2, EVERYONE),
+    "notes-detail": (4, EVERYONE),
+    "notes-export": (1, EVERYONE),
+    "notes-create": (2, SUPPORT),
+    "notes-update": (1, SUPPORT),
+    "notes-destroy": (1, SUPPORT),
+    "notes-bulk": (1, SUPPORT),
+    "changes": (2, EVERYONE),
+    "users-list": (1, MANAGEMENT),
+    "users-detail": (1, MANAGEMENT),
+    "users-update": (1, MANAGEMENT),
+    "async-clients-list": (2, EVERYONE),
+    "async-events-list": (2, EVERYONE),
+    "async-events-detail": (1, EVERYONE),
+    "async-events-updates": (2, SUPPORT_ONLY),
+    # Scraped by the monitoring rather than called by a user.
+    "metrics": (1, EVERYONE),
+}
+ROLE_WEIGHTS = {"management": 15, "sales": 50, "support": 35}
+# Dates of the rows written, which must not be in the past.
+FUTURE = "2100-01-01T10:00"
+
+
+def upcoming(date):
+    """The date of a row written back, or FUTURE once it is past."""
+    if date is None or date < timezone.now():
+        return FUTURE
+    # The only format the API checks dates in.
+    return timezone.localtime(date).strftime("%Y-%m-%dT%H:%M")
+
+
+def percentile(values, rank):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(rank / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Actor:
+    """A user replaying the workload, with a sample of the ids it can see."""
+
+    def __init__(self, user, sample_size, rng):
+        self.user = user
+        self.refresh = RoleTokenObtainPairSerializer.get_token(user)
+        self.authorization = f"Bearer {self.refresh.access_token}"
+
+        def sample(queryset):
+            ids = list(queryset.values_list("id", flat=True)[:sample_size])
+            rng.shuffle(ids)
+            return ids
+
+        self.client_ids = sample(Client.objects.visible_to(user))
+        self.contract_ids = sample(Contract.objects.visible_to(user))
+        self.event_ids = sample(Event.objects.visible_to(user))
+        self.notes = list(Note.objects.visible_to(user).values_list(
+            "event_id", "id")[:sample_size])
+        self.unsigned_contract_ids = sample(
+            Contract.objects.visible_to(user).filter(status=False))
+        self.writable_event_ids = sample(
+            Event.objects.visible_to(user).filter(event_over=False))
+        self.writable_notes = list(Note.objects.visible_to(user).filter(
+            event__event_over=False).values_list("event_id", "id")[
+                :sample_size])
+        rng.shuffle(self.writable_notes)
+
+    def forget_event(self, event_id):
+        """Stops calling the endpoints of a deleted event."""
+        for ids in (self.event_ids, self.writable_event_ids):
+            if event_id in ids:
+                ids.remove(event_id)
+        self.notes = [note for note in self.notes if note[0] != event_id]
+        self.writable_notes = [note for note in self.writable_notes
+                               if note[0] != event_id]
+
+    def forget_note(self, note):
+        for notes in (self.notes, self.writable_notes):
+            if note in notes:
+                notes.remove(note)
+
+
+class Command(BaseCommand):
+    help = ("Replays a mixed workload against every route of the CRM API, "
+            "async ones included, and reports latency percentiles, query "
+            "counts and peak memory per endpoint as JSON. It updates and "
+            "deletes rows: run it on a seeded copy of the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--actors", type=int, default=20,
+                            help="Number of users replaying the workload.")
+        parser.add_argument("--prefix", default="bench",
+                            help="Prefix of the users seeded by seed_crm.")
+        parser.add_argument("--memory-samples", type=int, default=3,
+                            help="Requests per endpoint traced for memory.")
+        parser.add_argument("--sample-size", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Writes the report to a file.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        users = list(User.objects.filter(
+            username__startswith=f"{options['prefix']}-"))
+        if not users:
+            raise CommandError("No seeded user found. Run seed_crm first.")
+
+        actors = self.pick_actors(users, options["actors"],
+                                  options["sample_size"])
+        # The queries are counted by the metrics of each call, which the
+        # middleware would replace with its own.
+        with override_settings(CRM_METRICS={**settings.CRM_METRICS,
+                                            "sample_rate": 0}):
+            self.http = TestClient(HTTP_HOST="localhost")
+            report = self.run(actors, options)
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def run(self, actors, options):
+        names = list(WORKLOAD)
+        weights = [WORKLOAD[name][0] for name in names]
+        measures = {name: {"latencies": [], "queries": [], "statuses": []}
+                    for name in names}
+
+        started = time.perf_counter()
+        for _ in range(options["requests"]):
+            actor = self.rng.choice(actors)
+            name = self.rng.choices(names, weights)[0]
+            if actor.user.role not in WORKLOAD[name][1]:
+                continue
+            measure = self.call(name, actor)
+            if measure is not None:
+                status, latency, queries = measure
+                measures[name]["latencies"].append(latency)
+                measures[name]["queries"].append(queries)
+                measures[name]["statuses"].append(status)
+        elapsed = time.perf_counter() - started
+
+        peaks = self.trace_memory(names, actors, options["memory_samples"])
+        return {
+            "database": connection.vendor,
+            "requests": sum(len(m["latencies"]) for m in measures.values()),
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": {
+                name: self.summarize(measure, peaks.get(name))
+                for name, measure in measures.items() if measure["latencies"]
+            },
+        }
+
+    def pick_actors(self, users, count, sample_size):
+        by_role = {role: [user for user in users if user.role == role]
+                   for role in ROLE_WEIGHTS}
+        roles = [role for role in ROLE_WEIGHTS if by_role[role]]
+        actors = []
+        for _ in range(count):
+            role = self.rng.choices(
+                roles, [ROLE_WEIGHTS[role] for role in roles])[0]
+            actors.append(Actor(self.rng.choice(by_role[role]),
+                                sample_size, self.rng))
+        return actors
+
+    def summarize(self, measure, peak):
+        latencies = measure["latencies"]
+        return {
+            "requests": len(latencies),
+            "errors": sum(1 for status in measure["statuses"]
+                          if status >= 500),
+            "denied": sum(1 for status in measure["statuses"]
+                          if 400 <= status < 500),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_queries": round(statistics.mean(measure["queries"]), 2),
+            "max_queries": max(measure["queries"]),
+            "peak_memory_kb": peak,
+        }
+
+    def trace_memory(self, names, actors, samples):
+        """
+        Peak Python allocations per endpoint, measured apart from the
+        timings so that tracing does not distort them.
+        """
+        peaks = {}
+        tracemalloc.start()
+        try:
+            for name in names:
+                allowed = [actor for actor in actors
+                           if actor.user.role in WORKLOAD[name][1]]
+                for actor in self.rng.sample(allowed,
+                                             min(samples, len(allowed))):
+                    tracemalloc.reset_peak()
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    if self.call(name, actor) is None:
+                        continue
+                    peak = (tracemalloc.get_traced_memory()[1]
+                            - baseline) // 1024
+                    peaks[name] = max(peaks.get(name, 0), peak)
+        finally:
+            tracemalloc.stop()
+        return peaks
+
+    def call(self, name, actor):
+        request = self.build_request(name, actor)
+        if request is None:
+            return None
+        method, path, data = request
+        headers = {}
+        if not name.startswith(("login", "metrics")):
+            headers["HTTP_AUTHORIZATION"] = actor.authorization
+        # Counts the queries of every thread the request runs on, such as
+        # the pool of the async views, which copies the metrics of the
+        # caller.
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with metrics.capture_queries():
+                started = time.perf_counter()
+                if method == "get":
+                    response = self.http.get(path, data, **headers)
+                else:
+                    response = getattr(self.http, method)(
+                        path, data, content_type="application/json",
+                        **headers)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                latency = time.perf_counter() - started
+        finally:
+            current.reset(token)
+        return response.status_code, latency, metrics.queries
+
+    def build_request(self, name, actor):
+        """
+        Method, path and data of a request, None when the actor has
+        nothing to call the endpoint on.
+        """
+        rng = self.rng
+        base = "/crm/v1"
+        pick = rng.choice
+        if name == "login":
+            return ("post", f"{base}/login/",
+                    json.dumps({"username": actor.user.username,
+                                "password": "bench-password"}))
+        if name == "login-refresh":
+            return ("post", f"{base}/login/refresh",
+                    json.dumps({"refresh": str(actor.refresh)}))
+        if name in ("clients-list", "async-clients-list"):
+            prefix = f"{base}/async" if name.startswith("async") else base
+            return "get", f"{prefix}/clients/", {"page_size": 50}
+        if name == "clients-search":
+            return "get", f"{base}/clients/", {"search": pick(["mar", "ber",
+                                                               "acme"])}
+        if name == "clients-summary":
+            return "get", f"{base}/clients/summary/", {
+                "by": pick(["client", "client", "sales_contact"])}
+        if name == "changes":
+            return "get", f"{base}/changes/", {"since": 0, "limit": 100}
+        if name == "metrics":
+            return "get", f"{base}/_metrics", {}
+        if name.startswith("clients-") and not actor.client_ids:
+            return None
+        if name == "clients-detail":
+            return "get", f"{base}/clients/{pick(actor.client_ids)}/", {}
+        if name == "clients-export":
+            return "get", f"{base}/clients/export/", {}
+        if name == "clients-create":
+            sales_contact = (actor.user.id if actor.user.role == "sales"
+                             else Client.objects.get(
+                                 id=pick(actor.client_ids)).sales_contact_id)
+            return ("post", f"{base}/clients/", json.dumps({
+                "first_name": "Walk", "last_name": "In",
+                "email": "lead@example.com", "phone": "0100000000",
+                "mobile": "0600000000", "company": "Walk-in",
+                "sales_contact": sales_contact,
+            }))
+        if name == "clients-update":
+            client = Client.objects.get(id=pick(actor.client_ids))
+            return ("put", f"{base}/clients/{client.id}/", json.dumps({
+                "first_name": client.first_name,
+                "last_name": client.last_name,
+                "email": client.email,
+                "phone": client.phone,
+                "mobile": client.mobile,
+                "company": client.company,
+                "sales_contact": client.sales_contact_id,
+            }))
+        if name == "clients-bulk":
+            sales_contact = (actor.user.id if actor.user.role == "sales"
+                             else Client.objects.get(
+                                 id=pick(actor.client_ids)).sales_contact_id)
+            return ("post", f"{base}/clients/bulk/", json.dumps([{
+                "first_name": "Bulk", "last_name": f"Lead {index}",
+                "email": "lead@example.com", "phone": "0100000000",
+                "mobile": "0600000000", "company": "Bulk import",
+                "sales_contact": sales_contact,
+            } for index in range(20)]))
+        if name == "contracts-list":
+            return "get", f"{base}/contracts/", {"page_size": 50}
+        if name == "contracts-export":
+            return "get", f"{base}/contracts/export/", {}
+        if name == "contracts-analytics":
+            return "get", f"{base}/contracts/analytics/", {
+                "group_by": pick(["status", "sales_contact", "client"]),
+                "bucket": "month"}
+        if name == "contracts-create":
+            if not actor.client_ids:
+                return None
+            return ("post", f"{base}/contracts/", json.dumps({
+                "client": pick(actor.client_ids), "amount": 1000,
+                "payment_due": FUTURE, "status": False,
+            }))
+        if name == "contracts-update":
+            if not actor.unsigned_contract_ids:
+                return None
+            contract = Contract.objects.get(
+                id=pick(actor.unsigned_contract_ids))
+            return ("put", f"{base}/contracts/{contract.id}/", json.dumps({
+                "client": contract.client_id,
+                "amount": contract.amount,
+                "payment_due": upcoming(contract.payment_due),
+                "status": False,
+            }))
+        if name == "contracts-detail":
+            if not actor.contract_ids:
+                return None
+            return "get", f"{base}/contracts/{pick(actor.contract_ids)}/", {}
+        if name == "contracts-bulk":
+            return ("post", f"{base}/contracts/bulk/", json.dumps([{
+                "client": pick(actor.client_ids), "amount": 1000,
+                "payment_due": "2100-01-01T10:00", "status": False,
+            } for _ in range(10)]))
+        if name in ("events-list", "async-events-list"):
+            prefix = f"{base}/async" if name.startswith("async") else base
+            return "get", f"{prefix}/events/", {"page_size": 50}
+        if name == "events-export":
+            return "get", f"{base}/events/export/", {}
+        if name in ("events-detail", "async-events-detail"):
+            if not actor.event_ids:
+                return None
+            prefix = f"{base}/async" if name.startswith("async") else base
+            return "get", f"{prefix}/events/{pick(actor.event_ids)}/", {}
+        if name == "events-updates":
+            return "get", f"{base}/events/updates/", {}
+        if name == "async-events-updates":
+            # Answers at once: the benchmark measures the polls, not the
+            # wait for an update.
+            return "get", f"{base}/async/events/updates/", {"timeout": 0}
+        if name in ("events-update", "events-destroy"):
+            if not actor.writable_event_ids:
+                return None
+            if name == "events-destroy":
+                event_id = pick(actor.writable_event_ids)
+                actor.forget_event(event_id)
+                return "delete", f"{base}/events/{event_id}/", {}
+            event = Event.objects.get(id=pick(actor.writable_event_ids))
+            return ("put", f"{base}/events/{event.id}/", json.dumps({
+                "client": event.client_id,
+                "support_contact": event.support_contact_id,
+                "event_over": False,
+                "attendees": event.attendees + 1,
+                "event_date": upcoming(event.event_date),
+            }))
+        if name.startswith("notes-"):
+            return self.build_note_request(name, actor, base)
+        if name == "users-list":
+            return "get", f"{base}/users/", {}
+        if name == "users-detail":
+            return "get", f"{base}/users/{actor.user.id}/", {}
+        if name == "users-update":
+            return ("put", f"{base}/users/{actor.user.id}/", json.dumps({
+                "username": actor.user.username, "role": actor.user.role,
+                "password": "bench-password",
+            }))
+        raise CommandError(f"Unknown endpoint {name}")
+
+    def build_note_request(self, name, actor, base):
+        if name in ("notes-create", "notes-bulk"):
+            if not actor.writable_event_ids:
+                return None
+            path = f"{base}/events/{self.rng.choice(actor.writable_event_ids)}"
+            if name == "notes-create":
+                return ("post", f"{path}/notes/",
+                        json.dumps({"description": "Call back the venue"}))
+            return ("post", f"{path}/notes/bulk/", json.dumps([
+                {"description": f"Checklist item {index}"}
+                for index in range(10)
+            ]))
+        if name in ("notes-update", "notes-destroy"):
+            if not actor.writable_notes:
+                return None
+            note = self.rng.choice(actor.writable_notes)
+            path = f"{base}/events/{note[0]}/notes/{note[1]}/"
+            if name == "notes-destroy":
+                actor.forget_note(note)
+                return "delete", path, {}
+            return "put", path, json.dumps({"description": "Venue booked"})
+        if not actor.notes:
+            return None
+        event_id, note_id = self.rng.choice(actor.notes)
+        path = f"{base}/events/{event_id}/notes/"
+        if name == "notes-list":
+            return "get", path, {}
+        if name == "notes-search":
+            return "get", path, {"search": self.rng.choice(["budget",
+                                                            "venue"])}
+        if name == "notes-export":
+            return "get", f"{path}export/", {}
+        return "get", f"{path}{note_id}/", {}
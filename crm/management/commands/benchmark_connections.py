@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+from accounts.authentication import RoleTokenObtainPairSerializer
+from accounts.models import User
+from crm.backends.postgresql.base import DatabaseWrapper
+from crm.models import Client
+
+from .benchmark_read_path import summary
+
+MODES = {
+    "new_connection": {"CONN_MAX_AGE": 0, "POOL": None},
+    "persistent": {"CONN_MAX_AGE": 60, "POOL": None},
+    "pool": {"CONN_MAX_AGE": 0, "POOL": {"max_size": 8, "timeout": 5}},
+}
+
+
+class Command(BaseCommand):
+    help = ("Compares the latency of short CRM requests opening a new "
+            "database connection each, reusing persistent connections and "
+            "borrowing pooled connections.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True,
+                            help="User whose token signs the requests.")
+        parser.add_argument("--path",
+                            help="Defaults to the detail of a client of "
+                                 "the user.")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=4)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['username']}")
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        self.authorization = f"Bearer {token}"
+        path = options["path"]
+        if path is None:
+            client = Client.objects.visible_to(user).first()
+            if client is None:
+                raise CommandError("The user sees no client.")
+            path = f"/crm/v1/clients/{client.id}/"
+
+        settings_dict = connections.databases["default"]
+        original = {key: settings_dict.get(key) for key in ("CONN_MAX_AGE",
+                                                            "POOL")}
+        report = {"database": connections["default"].vendor, "path": path}
+        try:
+            for mode, overrides in MODES.items():
+                if (overrides["POOL"]
+                        and not isinstance(connections["default"],
+                                           DatabaseWrapper)):
+                    report[mode] = "Needs the crm.backends.postgresql engine."
+                    continue
+                settings_dict.update(overrides)
+                connections["default"].close()
+                report[mode] = self.run(path, options["requests"],
+                                        options["concurrency"])
+        finally:
+            settings_dict.update(original)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, path, total, concurrency):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        def call(_):
+            environ = factory._base_environ(
+                PATH_INFO=path, REQUEST_METHOD="GET",
+                HTTP_AUTHORIZATION=self.authorization)
+            start = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            b"".join(response)
+            response.close()
+            return time.perf_counter() - start, response.status_code
+
+        barrier = threading.Barrier(concurrency, timeout=10)
+
+        def close_connections():
+            # Waiting at the barrier makes every thread run one of these, so
+            # that no persistent connection outlives the run.
+            connections.close_all()
+            barrier.wait()
+
+        connection_created.connect(count)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(call, range(total)))
+                elapsed = time.perf_counter() - start
+                for _ in range(concurrency):
+                    pool.submit(close_connections)
+        finally:
+            connection_created.disconnect(count)
+        return {**summary(results, elapsed), "connections_opened": len(opened)}
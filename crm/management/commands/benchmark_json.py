@@ -0,0 +1,81 @@
+import io
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.models import Client, Contract, Event
+from crm.parsers import JSONParser
+from crm.renderers import JSONRenderer
+from crm.serializers import (
+    ClientSerializer,
+    ContractSerializer,
+    EventSerializer
+)
+
+RESOURCES = {
+    "clients": (Client, ClientSerializer),
+    "contracts": (Contract, ContractSerializer),
+    "events": (Event, EventSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = ("Compares the time to render and parse serialized lists of "
+            "clients, contracts and events with the standard library and "
+            "with the JSON library of the API.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500,
+                            help="Serialized rows per list.")
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        rendering, parsing = JSONRenderer(), JSONParser()
+        if rendering.library is None:
+            raise CommandError("No faster JSON library is installed or "
+                               "CRM_JSON_LIBRARY selects the standard "
+                               "library.")
+        stdlib_rendering, stdlib_parsing = JSONRenderer(), JSONParser()
+        stdlib_rendering.library = stdlib_parsing.library = None
+
+        repeat = options["repeat"]
+        report = {"library": rendering.library.__name__}
+        for name, (model, serializer_class) in RESOURCES.items():
+            queryset = model.objects.order_by("id")[:options["rows"]]
+            data = serializer_class(queryset, many=True).data
+            if not data:
+                continue
+            body = stdlib_rendering.render(data)
+            render_ms = self.measure(lambda: rendering.render(data), repeat)
+            stdlib_render_ms = self.measure(
+                lambda: stdlib_rendering.render(data), repeat)
+            parse_ms = self.measure(
+                lambda: parsing.parse(io.BytesIO(body)), repeat)
+            stdlib_parse_ms = self.measure(
+                lambda: stdlib_parsing.parse(io.BytesIO(body)), repeat)
+            report[name] = {
+                "rows": len(data),
+                "bytes": len(body),
+                "identical": rendering.render(data) == body,
+                "stdlib_render_ms": stdlib_render_ms,
+                "render_ms": render_ms,
+                "render_speedup": round(stdlib_render_ms / render_ms, 1),
+                "stdlib_parse_ms": stdlib_parse_ms,
+                "parse_ms": parse_ms,
+                "parse_speedup": round(stdlib_parse_ms / parse_ms, 1),
+            }
+        if len(report) == 1:
+            raise CommandError("No row to render. Run seed_crm first.")
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, run, repeat):
+        """Mean time in ms of a run."""
+        run()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return round(statistics.mean(timings) * 1000, 3)
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from accounts.authentication import RoleTokenObtainPairSerializer
+from accounts.models import User
+
+
+def percentile(values, rank):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(rank / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summary(results, elapsed):
+    latencies = [latency for latency, status in results]
+    return {
+        "requests": len(latencies),
+        "errors": sum(1 for latency, status in results if status >= 400),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Compares latency percentiles and throughput of a read "
+            "endpoint served under WSGI, under ASGI, and of its async "
+            "mirror served under ASGI.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", required=True,
+                            help="User whose token signs the requests.")
+        parser.add_argument("--path", default="/crm/v1/clients/",
+                            help="Regular path; the async path is derived "
+                                 "from it.")
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=64)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['username']}")
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        self.authorization = f"Bearer {token}"
+
+        path = options["path"]
+        async_path = path.replace("/crm/v1/", "/crm/v1/async/", 1)
+        total, concurrency = options["requests"], options["concurrency"]
+        report = {
+            "wsgi": self.run_wsgi(path, total, concurrency),
+            "asgi": asyncio.run(self.run_asgi(path, total, concurrency)),
+            "asgi_async": asyncio.run(self.run_asgi(async_path, total,
+                                                    concurrency)),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run_wsgi(self, path, total, concurrency):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+
+        def call(_):
+            environ = factory._base_environ(
+                PATH_INFO=path, REQUEST_METHOD="GET", HTTP_HOST="localhost",
+                HTTP_AUTHORIZATION=self.authorization)
+            start = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            b"".join(response)
+            response.close()
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(call, range(total)))
+        return summary(results, time.perf_counter() - start)
+
+    async def run_asgi(self, path, total, concurrency):
+        application = get_asgi_application()
+        semaphore = asyncio.Semaphore(concurrency)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"authorization", self.authorization.encode()),
+            ],
+            "server": ("localhost", 80),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def call():
+            statuses = []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(dict(scope), receive, send)
+                return time.perf_counter() - start, statuses[0]
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(call() for _ in range(total)))
+        return summary(results, time.perf_counter() - start)
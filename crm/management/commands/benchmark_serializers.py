@@ -0,0 +1,77 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from crm.compiled import compile_serializer
+from crm.models import Client, Contract, Event, Note
+from crm.renderers import render_json
+from crm.serializers import (
+    ClientSerializer,
+    ContractSerializer,
+    EventSerializer,
+    NoteSerializer
+)
+
+RESOURCES = {
+    "clients": (Client, ClientSerializer),
+    "contracts": (Contract, ContractSerializer),
+    "events": (Event, EventSerializer),
+    "notes": (Note, NoteSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = ("Compares the time to read and render a page of each CRM list "
+            "with the DRF serializers and with their compiled form, and "
+            "checks that both output the same JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500,
+                            help="Rows per rendered page.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        report = {}
+        for name, (model, serializer_class) in RESOURCES.items():
+            queryset = model.objects.order_by("id")[:rows]
+            if not queryset.exists():
+                continue
+            compiled = compile_serializer(serializer_class)
+            if compiled is None:
+                raise CommandError(f"{serializer_class.__name__} does not "
+                                   f"compile.")
+
+            def with_serializer():
+                return JSONRenderer().render(
+                    serializer_class(queryset, many=True).data)
+
+            def with_compiled():
+                return render_json(compiled.render(
+                    queryset.values_list(*compiled.columns)))
+
+            serializer_ms = self.measure(with_serializer, repeat)
+            compiled_ms = self.measure(with_compiled, repeat)
+            report[name] = {
+                "rows": queryset.count(),
+                "identical": with_serializer() == bytes(with_compiled()),
+                "serializer_ms": serializer_ms,
+                "compiled_ms": compiled_ms,
+                "speedup": round(serializer_ms / compiled_ms, 1),
+            }
+        if not report:
+            raise CommandError("No row to render. Run seed_crm first.")
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, render, repeat):
+        """Mean time in ms of a render, the query included."""
+        render()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - started)
+        return round(statistics.mean(timings) * 1000, 2)
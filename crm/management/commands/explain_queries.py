@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.loader import MigrationLoader
+
+from accounts.models import User
+from crm.models import Client, Contract, Event, Note
+from crm.pagination import (
+    ClientPagination,
+    ContractPagination,
+    EventPagination,
+    NotePagination
+)
+
+
+class Command(BaseCommand):
+    help = ("Prints the query plans of the role-scoped list queries "
+            "and of the hot filters of the CRM API.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--compare", metavar="MIGRATION",
+            help="Also prints the plans without the schema changes of a "
+                 "migration of crm, e.g. 0009, which are reverted in a "
+                 "transaction rolled back afterwards. The tables stay "
+                 "locked meanwhile: run it on a copy of the database.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        self.database = options["database"]
+        if options["compare"] is None:
+            for name, plan in self.explain().items():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(plan)
+            return
+
+        migration = self.get_migration(options["compare"])
+        after = self.explain()
+        before = self.explain_unapplied(migration)
+        for name, plan in after.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"-- without {migration.name}")
+            self.stdout.write(before[name])
+            self.stdout.write(f"-- with {migration.name}")
+            self.stdout.write(plan)
+
+    def get_migration(self, prefix):
+        connection = connections[self.database]
+        loader = MigrationLoader(connection)
+        try:
+            migration = loader.get_migration_by_prefix("crm", prefix)
+        except (KeyError, ValueError) as error:
+            raise CommandError(error.args[0])
+        if ("crm", migration.name) not in loader.applied_migrations:
+            raise CommandError(f"{migration.name} is not applied.")
+        self.state = loader.project_state(("crm", migration.name),
+                                          at_end=False)
+        return migration
+
+    def explain_unapplied(self, migration):
+        """Plans of the queries once the migration is reverted."""
+        connection = connections[self.database]
+        # SQLite cannot disable them within a transaction.
+        constraints_disabled = connection.disable_constraint_checking()
+        try:
+            with transaction.atomic(using=self.database):
+                with connection.schema_editor(atomic=False) as editor:
+                    migration.unapply(self.state, editor)
+                plans = self.explain()
+                transaction.set_rollback(True, using=self.database)
+            return plans
+        finally:
+            if constraints_disabled:
+                connection.enable_constraint_checking()
+
+    def explain(self):
+        """Plan of each query, by name."""
+        users = User.objects.using(self.database)
+        sales = users.filter(role="sales").first()
+        support = users.filter(role="support").first()
+        event = Event.objects.using(self.database).first()
+        queries = {
+            "clients (sales)": Client.objects.visible_to(sales).order_by(
+                *ClientPagination().get_ordering()),
+            "clients (support)": Client.objects.visible_to(support).order_by(
+                *ClientPagination().get_ordering()),
+            "clients company=": Client.objects.filter(
+                company__iexact="acme"),
+            "clients last_name=": Client.objects.filter(
+                last_name__iexact="smith"),
+            "contracts (sales)": Contract.objects.visible_to(sales).order_by(
+                *ContractPagination().get_ordering()),
+            "contracts status=": Contract.objects.filter(
+                status=True).order_by("payment_due"),
+            "events (support)": Event.objects.visible_to(support).order_by(
+                *EventPagination().get_ordering()),
+            "events event_over=": Event.objects.filter(
+                event_over=False).order_by("event_date"),
+            "notes of an event": Note.objects.filter(event=event).order_by(
+                *NotePagination().get_ordering()),
+        }
+        return {name: queryset.using(self.database).explain()
+                for name, queryset in queries.items()}
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from crm import rollups
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the dashboard rollups of every client, or of the "
+            "given clients, from their contracts, events and notes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("client_ids", nargs="*", type=int)
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = rollups.rebuild(options["client_ids"] or None,
+                                options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the rollups of {count} clients."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from crm import visibility
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the events and clients each sales and support "
+            "contact can read, from the clients and events.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = visibility.rebuild(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} visibility rows."))
@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from crm import jobs
+
+POOLS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+class Command(BaseCommand):
+    help = ("Runs the background jobs of the outbox on a pool of threads "
+            "or processes, retrying failed jobs with an exponential "
+            "backoff.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pool", choices=POOLS, default="thread")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=50,
+                            help="Jobs claimed at once.")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds to wait when no job is due.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exits once no job is due.")
+
+    def handle(self, *args, **options):
+        pool = options["pool"]
+        executor_options = {"max_workers": options["workers"]}
+        if pool == "process":
+            # Processes set up Django again when not forked.
+            executor_options["initializer"] = django.setup
+        with POOLS[pool](**executor_options) as executor:
+            try:
+                self.work(executor, pool, options)
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping once the running jobs end.")
+
+    def work(self, executor, pool, options):
+        while True:
+            job_ids = jobs.claim(options["batch_size"])
+            if not job_ids:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+            if pool == "process":
+                # Forked processes must not share the connections of the
+                # parent: they open their own.
+                connections.close_all()
+            results = list(executor.map(jobs.run_in_worker, job_ids))
+            succeeded = sum(results)
+            if options["verbosity"] > 0:
+                self.stdout.write(f"Ran {len(results)} jobs: {succeeded} "
+                                  f"succeeded, {len(results) - succeeded} "
+                                  f"failed.")
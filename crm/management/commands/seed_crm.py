@@ -0,0 +1,169 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from crm import rollups, visibility
+from crm.cache import RESOURCES, list_cache
+from crm.models import Client, Contract, Event, Note
+
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark",
+             "Wayne", "Wonka", "Tyrell", "Cyberdyne", "Soylent", "Vandelay"]
+FIRST_NAMES = ["Alice", "Bruno", "Chloe", "David", "Emma", "Farid", "Grace",
+               "Hugo", "Ines", "Jules", "Karim", "Lea", "Manon", "Nathan"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard",
+              "Petit", "Durand", "Leroy", "Moreau", "Simon", "Laurent",
+              "Lefebvre", "Michel", "Garcia", "David", "Bertrand", "Roux"]
+WORDS = ["catering", "venue", "budget", "guests", "stage", "lighting",
+         "schedule", "transport", "speaker", "badge", "security", "menu",
+         "invoice", "sound", "parking", "decoration", "agenda", "wifi"]
+
+
+def zipf_weights(count, exponent=1.1):
+    """Weights of a Zipf law: a few contacts get most of the rows."""
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+class Command(BaseCommand):
+    help = ("Seeds the database with CRM users, clients, contracts, events "
+            "and notes, skewed the way a real portfolio is.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=60)
+        parser.add_argument("--clients", type=int, default=5000)
+        parser.add_argument("--contracts-per-client", type=float, default=2)
+        parser.add_argument("--events-per-client", type=float, default=1.5)
+        parser.add_argument("--notes-per-event", type=float, default=4)
+        parser.add_argument("--prefix", default="bench",
+                            help="Prefix of the usernames of seeded users.")
+        parser.add_argument("--password", default="bench-password")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Users prefixed with '{prefix}-' already "
+                               f"exist. Choose another --prefix.")
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+
+        with transaction.atomic():
+            users = self.seed_users(prefix, options["users"],
+                                    options["password"])
+            clients = self.seed_clients(users["sales"], options["clients"])
+            contracts = self.seed_contracts(
+                clients, options["contracts_per_client"])
+            events = self.seed_events(clients, users["support"],
+                                      options["events_per_client"])
+            notes = self.seed_notes(events, options["notes_per_event"])
+            rollups.rebuild(batch_size=self.batch_size)
+            visibility.rebuild(batch_size=self.batch_size)
+        # bulk_create sends no signal: drop every cached list.
+        list_cache.invalidate(RESOURCES)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(len(group) for group in users.values())} users, "
+            f"{len(clients)} clients, {contracts} contracts, "
+            f"{len(events)} events and {notes} notes."
+        ))
+
+    def count(self, mean):
+        """Draws a row count around a mean, with a long tail."""
+        if mean <= 0:
+            return 0
+        return int(self.random.expovariate(1 / mean) + 0.5)
+
+    def seed_users(self, prefix, count, password):
+        password = make_password(password)
+        shares = {"management": 0.1, "sales": 0.45, "support": 0.45}
+        users = {}
+        for role, share in shares.items():
+            users[role] = User.objects.bulk_create([
+                User(username=f"{prefix}-{role}-{index}", role=role,
+                     password=password)
+                for index in range(max(1, int(count * share)))
+            ])
+        # bulk_create does not return primary keys on every database.
+        for role in users:
+            users[role] = list(User.objects.filter(
+                username__startswith=f"{prefix}-{role}-").order_by("id"))
+        return users
+
+    def seed_clients(self, sales, count):
+        weights = zipf_weights(len(sales))
+        sales_contacts = self.random.choices(sales, weights, k=count)
+        clients = [
+            Client(
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                email=f"client{index}@example.com",
+                phone="0100000000",
+                mobile="0600000000",
+                company=(f"{self.random.choice(COMPANIES)} "
+                         f"{self.random.randint(1, count // 10 + 1)}"),
+                sales_contact=sales_contact,
+            )
+            for index, sales_contact in enumerate(sales_contacts)
+        ]
+        first = Client.objects.order_by("-id").values_list(
+            "id", flat=True).first() or 0
+        Client.objects.bulk_create(clients, batch_size=self.batch_size)
+        return list(Client.objects.filter(id__gt=first).order_by("id"))
+
+    def seed_contracts(self, clients, per_client):
+        contracts = []
+        for client in clients:
+            for _ in range(self.count(per_client)):
+                offset = self.random.randint(-365, 365)
+                contracts.append(Contract(
+                    client=client,
+                    sales_contact_id=client.sales_contact_id,
+                    status=self.random.random() < 0.6,
+                    amount=round(self.random.lognormvariate(8, 1), 2),
+                    payment_due=self.now + datetime.timedelta(days=offset),
+                ))
+        Contract.objects.bulk_create(contracts, batch_size=self.batch_size)
+        return len(contracts)
+
+    def seed_events(self, clients, support, per_client):
+        weights = zipf_weights(len(support))
+        events = []
+        for client in clients:
+            for _ in range(self.count(per_client)):
+                offset = self.random.randint(-365, 365)
+                unassigned = self.random.random() < 0.1
+                events.append(Event(
+                    client=client,
+                    support_contact=(
+                        None if unassigned
+                        else self.random.choices(support, weights)[0]
+                    ),
+                    event_over=offset < 0 and self.random.random() < 0.8,
+                    attendees=int(self.random.lognormvariate(4, 1)),
+                    event_date=(
+                        None if self.random.random() < 0.05
+                        else self.now + datetime.timedelta(days=offset)
+                    ),
+                ))
+        first = Event.objects.order_by("-id").values_list(
+            "id", flat=True).first() or 0
+        Event.objects.bulk_create(events, batch_size=self.batch_size)
+        return list(Event.objects.filter(id__gt=first).values_list(
+            "id", flat=True))
+
+    def seed_notes(self, events, per_event):
+        notes = []
+        for event_id in events:
+            for _ in range(self.count(per_event)):
+                words = self.random.choices(WORDS,
+                                            k=self.random.randint(5, 60))
+                notes.append(Note(event_id=event_id,
+                                  description=" ".join(words)))
+        Note.objects.bulk_create(notes, batch_size=self.batch_size)
+        return len(notes)
@@ -0,0 +1,227 @@
+import contextvars
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+from .backends.pool import opened, pools
+
+TIMINGS = ("total", "view", "serializer", "db")
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Metrics of the sampled request being served, None when not sampled.
+current = contextvars.ContextVar("crm_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Query count, database time and timings of one sampled request."""
+
+    def __init__(self):
+        self.timings = dict.fromkeys(TIMINGS, 0.0)
+        self.statements = Counter()
+        self.running = set()
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        """
+        Queries whose SQL, parameters aside, was already run by the request:
+        the signature of an N+1 pattern.
+        """
+        return sum(count - 1 for count in self.statements.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings["db"] += time.perf_counter() - started
+            self.statements[sql] += 1
+
+    @contextmanager
+    def capture_queries(self):
+        """Records the queries run by the current thread on every database."""
+        with ExitStack() as stack:
+            for alias in connections:
+                # Nested captures of a same thread record a query once.
+                if self not in connections[alias].execute_wrappers:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(self))
+            yield
+
+    @contextmanager
+    def timer(self, name):
+        # Nested timers of a same name, e.g. nested serializers, count once.
+        if name in self.running:
+            yield
+            return
+        self.running.add(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - started
+            self.running.discard(name)
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.timings["db"] * 1000:.2f};'
+            f'desc="{self.queries} queries, {self.duplicates} duplicated"'
+        ]
+        for name in ("serializer", "view", "total"):
+            metrics.append(f"{name};dur={self.timings[name] * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+@contextmanager
+def timed(name):
+    """Adds the time spent in the block to the metrics of the request."""
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.timer(name):
+        yield
+
+
+@contextmanager
+def capture_queries():
+    """
+    Records the queries of the current thread in the metrics of the request,
+    for views that run their queries on another thread than the middleware.
+    """
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.capture_queries():
+        yield
+
+
+class TimedSerializerMixin:
+    """Adds the time spent serializing objects to the request metrics."""
+
+    def to_representation(self, instance):
+        with timed("serializer"):
+            return super().to_representation(instance)
+
+
+class TimedViewMixin:
+    """
+    Adds the time spent in the DRF view, and its queries, to the request
+    metrics. Under ASGI, the view runs on another thread than the
+    middleware.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with timed("view"), capture_queries():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class MetricsRegistry:
+    """
+    Metrics of the sampled requests of each endpoint: totals since the start
+    of the process, and quantiles over a rolling window of the last requests.
+    """
+
+    def __init__(self, window):
+        self.lock = threading.Lock()
+        self.window = defaultdict(lambda: deque(maxlen=window))
+        self.counts = Counter()
+        self.sums = defaultdict(Counter)
+
+    def record(self, endpoint, method, metrics):
+        sample = {**metrics.timings, "queries": metrics.queries,
+                  "duplicates": metrics.duplicates}
+        with self.lock:
+            self.window[endpoint, method].append(sample)
+            self.counts[endpoint, method] += 1
+            self.sums[endpoint, method].update(sample)
+
+    def render(self):
+        """Renders the metrics in the Prometheus text format."""
+        with self.lock:
+            window = {key: list(samples)
+                      for key, samples in self.window.items()}
+            counts = self.counts.copy()
+            sums = {key: sample.copy() for key, sample in self.sums.items()}
+
+        lines = []
+        summaries = [
+            ("crm_request_duration_seconds",
+             "Time spent serving sampled requests.", TIMINGS),
+            ("crm_request_queries",
+             "Database queries of sampled requests.", ("queries",)),
+            ("crm_request_duplicate_queries",
+             "Repeated SQL statements of sampled requests.", ("duplicates",)),
+        ]
+        for metric, description, fields in summaries:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} summary")
+            for (endpoint, method), samples in sorted(window.items()):
+                for field in fields:
+                    labels = f'endpoint="{endpoint}",method="{method}"'
+                    if len(fields) > 1:
+                        labels += f',timing="{field}"'
+                    values = sorted(sample[field] for sample in samples)
+                    for quantile in QUANTILES:
+                        index = math.ceil(quantile * len(values)) - 1
+                        lines.append(f'{metric}{{{labels},'
+                                     f'quantile="{quantile}"}} '
+                                     f'{values[index]:g}')
+                    lines.append(f"{metric}_sum{{{labels}}} "
+                                 f"{sums[endpoint, method][field]:g}")
+                    lines.append(f"{metric}_count{{{labels}}} "
+                                 f"{counts[endpoint, method]}")
+        lines.extend(connection_metrics())
+        return "\n".join(lines) + "\n"
+
+
+def connection_metrics():
+    """Connections opened and state of the connection pools, by database."""
+    lines = [
+        "# HELP crm_db_connections_opened_total Database connections opened.",
+        "# TYPE crm_db_connections_opened_total counter",
+    ]
+    lines.extend(f'crm_db_connections_opened_total{{alias="{alias}"}} {count}'
+                 for alias, count in sorted(opened.items()))
+    stats = {alias: pool.stats() for alias, pool in sorted(pools.items())}
+    gauges = [
+        ("crm_db_pool_connections_in_use", "gauge", "in_use",
+         "Pooled connections borrowed by a thread."),
+        ("crm_db_pool_connections_idle", "gauge", "idle",
+         "Pooled connections waiting to be borrowed."),
+        ("crm_db_pool_max_size", "gauge", "max_size",
+         "Maximum number of pooled connections."),
+        ("crm_db_pool_waits_total", "counter", "waits",
+         "Borrows that waited for a connection."),
+        ("crm_db_pool_wait_seconds_total", "counter", "wait_seconds",
+         "Time spent waiting for a connection."),
+        ("crm_db_pool_timeouts_total", "counter", "timeouts",
+         "Borrows that gave up waiting for a connection."),
+    ]
+    for metric, kind, field, description in gauges:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(f'{metric}{{alias="{alias}"}} {values[field]:g}'
+                     for alias, values in stats.items())
+    return lines
+
+
+registry = MetricsRegistry(settings.CRM_METRICS["window"])
+
+
+def metrics_view(request):
+    """Scrape endpoint of the request metrics, served to INTERNAL_IPS only."""
+    if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        raise Http404()
+    return HttpResponse(registry.render(),
+                        content_type="text/plain; version=0.0.4")
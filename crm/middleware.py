@@ -0,0 +1,78 @@
+import asyncio
+import random
+
+from django.conf import settings
+
+try:
+    from asgiref.sync import markcoroutinefunction
+except ImportError:
+    # asgiref < 3.6
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+from .metrics import RequestMetrics, current, registry
+
+
+def endpoint_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.url_name or match.route
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the query count, database time, duplicated queries, serializer
+    time and view time of a sample of the requests, and returns them in a
+    Server-Timing header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.CRM_METRICS["sample_rate"]
+        self.server_timing = settings.CRM_METRICS["server_timing"]
+        # Under ASGI, a sync-only middleware would run every request, long
+        # polls included, on the single thread of the sync views.
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with metrics.capture_queries(), metrics.timer("total"):
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.record(request, response, metrics)
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            # The queries run on the threads of the views, which capture
+            # them, the event loop running none.
+            with metrics.timer("total"):
+                response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.record(request, response, metrics)
+
+    def record(self, request, response, metrics):
+        registry.record(endpoint_name(request), request.method, metrics)
+        if self.server_timing:
+            response["Server-Timing"] = metrics.server_timing()
+        return response
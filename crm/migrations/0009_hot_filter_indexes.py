@@ -0,0 +1,58 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:07
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0008_alter_event_event_date"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["last_name", "id"], name="client_last_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(fields=["sales_contact", "last_name", "id"], name="client_sales_last_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(django.db.models.functions.text.Upper("last_name"), name="client_upper_last_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="client",
+            index=models.Index(django.db.models.functions.text.Upper("company"), name="client_upper_company_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="contract",
+            index=models.Index(fields=["sales_contact", "id"], name="contract_sales_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="contract",
+            index=models.Index(fields=["status", "payment_due"], name="contract_status_due_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="contract",
+            index=models.Index(fields=["payment_due"], name="contract_due_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["event_date", "id"], name="event_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["support_contact", "event_date", "id"], name="event_support_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["event_over", "event_date"], name="event_over_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(fields=["event", "id"], name="note_event_id_idx"),
+        ),
+    ]
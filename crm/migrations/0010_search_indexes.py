@@ -0,0 +1,52 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    ("client_first_name_trgm_idx", "crm_client", "first_name"),
+    ("client_last_name_trgm_idx", "crm_client", "last_name"),
+    ("client_company_trgm_idx", "crm_client", "company"),
+    ("note_description_trgm_idx", "crm_note", "description"),
+]
+
+FULL_TEXT_INDEXES = [
+    ("note_description_fts_idx", "crm_note", "description"),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    pg_trgm GIN indexes serve the icontains filters, which compile to
+    UPPER(field::text) LIKE UPPER(...) on PostgreSQL, and the tsvector
+    indexes serve full-text search. Other databases are left unchanged.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+            f"USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+    for name, table, column in FULL_TEXT_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+            f"USING gin (to_tsvector('english'::regconfig, "
+            f"COALESCE({column}, '')))"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, column in TRIGRAM_INDEXES + FULL_TEXT_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0009_hot_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
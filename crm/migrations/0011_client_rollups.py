@@ -0,0 +1,65 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:23
+
+from django.db import migrations, models
+from django.db.models import (Count, FloatField, IntegerField, OuterRef, Q,
+                              Subquery, Sum)
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def aggregate_of(model, client_path, aggregate, condition=Q(),
+                 output_field=IntegerField):
+    rows = model.objects.filter(condition, **{client_path: OuterRef("pk")})
+    return Coalesce(
+        Subquery(rows.order_by().values(client_path).annotate(
+            value=aggregate).values("value")),
+        0,
+        output_field=output_field(),
+    )
+
+
+def populate_rollups(apps, schema_editor):
+    Client = apps.get_model("crm", "Client")
+    ClientRollup = apps.get_model("crm", "ClientRollup")
+    Contract = apps.get_model("crm", "Contract")
+    Event = apps.get_model("crm", "Event")
+    Note = apps.get_model("crm", "Note")
+    rows = Client.objects.annotate(
+        open_contracts=aggregate_of(Contract, "client", Count("id"),
+                                    Q(status=False)),
+        signed_contracts=aggregate_of(Contract, "client", Count("id"),
+                                      Q(status=True)),
+        signed_amount=aggregate_of(Contract, "client", Sum("amount"),
+                                   Q(status=True), FloatField),
+        upcoming_events=aggregate_of(Event, "client", Count("id"),
+                                     Q(event_over=False)),
+        notes=aggregate_of(Note, "event__client", Count("id")),
+    ).values("id", "open_contracts", "signed_contracts", "signed_amount",
+             "upcoming_events", "notes")
+    ClientRollup.objects.bulk_create(
+        [ClientRollup(client_id=row.pop("id"), **row)
+         for row in rows.iterator()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0010_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClientRollup",
+            fields=[
+                ("client", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="rollup", serialize=False, to="crm.client")),
+                ("open_contracts", models.IntegerField(default=0)),
+                ("signed_contracts", models.IntegerField(default=0)),
+                ("signed_amount", models.FloatField(default=0)),
+                ("upcoming_events", models.IntegerField(default=0)),
+                ("notes", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
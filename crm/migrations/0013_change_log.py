@@ -0,0 +1,40 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0012_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('data', models.JSONField(null=True)),
+                ('sales_contact_id', models.BigIntegerField(null=True)),
+                ('support_contact_id', models.BigIntegerField(null=True)),
+                ('previous_contact_id', models.BigIntegerField(null=True)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['sales_contact_id', 'id'], name='change_sales_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['support_contact_id', 'id'], name='change_support_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['previous_contact_id', 'id'], name='change_previous_id_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_visibility(apps, schema_editor):
+    Event = apps.get_model("crm", "Event")
+    Visibility = apps.get_model("crm", "Visibility")
+    contacts = (
+        ("sales", "client__sales_contact_id"),
+        ("support", "support_contact_id"),
+    )
+    for role, contact in contacts:
+        rows = Event.objects.filter(
+            **{f"{contact}__isnull": False}).values_list(
+            contact, "client_id", "id")
+        Visibility.objects.bulk_create(
+            [Visibility(role=role, user_id=user_id, client_id=client_id,
+                        event_id=event_id)
+             for user_id, client_id, event_id in rows.iterator()],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('crm', '0013_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Visibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(max_length=10)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='crm.client')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='crm.event')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='visibility',
+            index=models.Index(fields=['user', 'role', 'event'], name='visibility_event_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visibility',
+            index=models.Index(fields=['user', 'role', 'client'], name='visibility_client_idx'),
+        ),
+        migrations.RunPython(populate_visibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:02
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_changes(apps, schema_editor):
+    # Existing changes keep their id as sequence number, so that consumers
+    # resume where they are.
+    Change = apps.get_model("crm", "Change")
+    ChangeSequence = apps.get_model("crm", "ChangeSequence")
+    Change.objects.update(seq=F("id"))
+    ChangeSequence.objects.create(
+        id=1, last=Change.objects.aggregate(last=Max("id"))["last"] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0014_visibility'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_sales_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_support_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_previous_id_idx',
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='seq',
+            field=models.BigIntegerField(null=True, unique=True),
+        ),
+        migrations.RunPython(number_changes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['sales_contact_id', 'seq'], name='change_sales_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['support_contact_id', 'seq'], name='change_support_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['previous_contact_id', 'seq'], name='change_previous_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(condition=models.Q(('seq', None)), fields=['id'], name='change_unsequenced_idx'),
+        ),
+    ]
@@ -1,10 +1,116 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 
-class Client(models.Model):
+class ScopedQuerySet(models.QuerySet):
+    def visibility(self, user):
+        """Condition on the rows a user can read, None for every row."""
+        return None
 
-    objects = None
+    def visible_to(self, user):
+        """Rows a user can read, resolved in a single SQL statement."""
+        condition = self.visibility(user)
+        return self if condition is None else self.filter(condition)
+
+    def with_visibility(self, user):
+        """Annotates rows with is_visible, telling if a user can read them."""
+        condition = self.visibility(user)
+        if condition is None:
+            is_visible = models.Value(True, output_field=models.BooleanField())
+        else:
+            is_visible = models.Case(
+                models.When(condition, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            )
+        return self.annotate(is_visible=is_visible)
+
+
+def granted(user, **lookups):
+    """
+    Condition on a visibility row granting the outer row to a user through
+    their role, checked by one probe of the visibility index per row.
+    """
+    return models.Exists(Visibility.objects.filter(
+        user_id=user.id, role=user.role,
+        **{field: models.OuterRef(outer)
+           for field, outer in lookups.items()}))
+
+
+class ClientQuerySet(ScopedQuerySet):
+    def visibility(self, user):
+        if user.role == "sales":
+            return models.Q(sales_contact=user)
+        elif user.role == "support":
+            return models.Q(granted(user, client_id="id"))
+        return None
+
+
+class ContractQuerySet(ScopedQuerySet):
+    def visibility(self, user):
+        if user.role == "sales":
+            return models.Q(sales_contact=user)
+        return None
+
+
+class EventQuerySet(ScopedQuerySet):
+    def visibility(self, user):
+        if user.role == "sales":
+            return models.Q(granted(user, event_id="id"))
+        elif user.role == "support":
+            return models.Q(support_contact=user)
+        return None
+
+
+class NoteQuerySet(ScopedQuerySet):
+    def visibility(self, user):
+        """Notes are visible through the event they belong to."""
+        if user.role in ("sales", "support"):
+            return models.Q(granted(user, event_id="event_id"))
+        return None
+
+
+class ChangeQuerySet(ScopedQuerySet):
+    def visibility(self, user):
+        """
+        Changes of the rows a user could read when they changed, and of the
+        rows reassigned away from them.
+        """
+        if user.role == "sales":
+            return (models.Q(sales_contact_id=user.id)
+                    | models.Q(previous_contact_id=user.id,
+                               resource__in=["clients", "contracts"]))
+        elif user.role == "support":
+            return ~models.Q(resource="contracts") & (
+                models.Q(support_contact_id=user.id)
+                | models.Q(previous_contact_id=user.id, resource="events")
+                | models.Q(granted(user, client_id="object_id"),
+                           resource="clients")
+            )
+        return None
+
+
+class ChangeLoggedModel(models.Model):
+    """
+    Model whose saves run in a transaction shared with their post_save
+    receivers, which log the change. Deletes already do.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self),
+                                                           instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class Client(ChangeLoggedModel):
+
+    objects = ClientQuerySet.as_manager()
     first_name = models.CharField(max_length=25)
     last_name = models.CharField(max_length=25)
     email = models.CharField(max_length=100)
@@ -17,6 +123,17 @@ class Client(models.Model):
         to=settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["last_name", "id"],
+                         name="client_last_name_idx"),
+            models.Index(fields=["sales_contact", "last_name", "id"],
+                         name="client_sales_last_name_idx"),
+            models.Index(Upper("last_name"),
+                         name="client_upper_last_name_idx"),
+            models.Index(Upper("company"), name="client_upper_company_idx"),
+        ]
+
     def __str__(self):
         return (
             f"{self.first_name} {self.last_name} "
@@ -24,7 +141,9 @@ class Client(models.Model):
         )
 
 
-class Contract(models.Model):
+class Contract(ChangeLoggedModel):
+
+    objects = ContractQuerySet.as_manager()
 
     sales_contact = models.ForeignKey(
         to=settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL
@@ -36,11 +155,22 @@ class Contract(models.Model):
     amount = models.FloatField()
     payment_due = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["sales_contact", "id"],
+                         name="contract_sales_id_idx"),
+            models.Index(fields=["status", "payment_due"],
+                         name="contract_status_due_idx"),
+            models.Index(fields=["payment_due"], name="contract_due_idx"),
+        ]
+
     def __str__(self):
         return f"{self.client} - contract n°{self.pk}"
 
 
-class Event(models.Model):
+class Event(ChangeLoggedModel):
+
+    objects = EventQuerySet.as_manager()
 
     client = models.ForeignKey(to=Client, on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
@@ -52,14 +182,163 @@ class Event(models.Model):
     attendees = models.IntegerField()
     event_date = models.DateTimeField(null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["event_date", "id"],
+                         name="event_date_idx"),
+            models.Index(fields=["support_contact", "event_date", "id"],
+                         name="event_support_date_idx"),
+            models.Index(fields=["event_over", "event_date"],
+                         name="event_over_date_idx"),
+        ]
+
     def __str__(self):
         return f"Event {self.client.company} ({self.event_date})"
 
 
-class Note(models.Model):
+class Note(ChangeLoggedModel):
+
+    objects = NoteQuerySet.as_manager()
 
     description = models.TextField()
     event = models.ForeignKey(to=Event, null=True, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["event", "id"], name="note_event_id_idx"),
+        ]
+
     def __str__(self):
         return f"Event: {self.description}"
+
+
+class Visibility(models.Model):
+    """
+    Event a sales or support contact reads through their role, with its
+    client, kept up to date by crm.visibility on every reassignment. The
+    scopes which would join clients and events read this table instead.
+    """
+
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, db_index=False,
+                             related_name="+", on_delete=models.CASCADE)
+    role = models.CharField(max_length=10)
+    client = models.ForeignKey(to=Client, related_name="+",
+                               on_delete=models.CASCADE)
+    event = models.ForeignKey(to=Event, related_name="+",
+                              on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "role", "event"],
+                         name="visibility_event_idx"),
+            models.Index(fields=["user", "role", "client"],
+                         name="visibility_client_idx"),
+        ]
+
+    def __str__(self):
+        return f"Event {self.event_id} visible to {self.user_id}"
+
+
+class ClientRollup(models.Model):
+    """
+    Counters of a client read by the dashboards, kept up to date by
+    crm.rollups on every save and delete of its contracts, events and notes.
+    """
+
+    client = models.OneToOneField(to=Client, primary_key=True,
+                                  related_name="rollup",
+                                  on_delete=models.CASCADE)
+    open_contracts = models.IntegerField(default=0)
+    signed_contracts = models.IntegerField(default=0)
+    signed_amount = models.FloatField(default=0)
+    upcoming_events = models.IntegerField(default=0)
+    notes = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Rollup of {self.client_id}"
+
+
+class Job(models.Model):
+    """
+    Background job of the outbox, saved in the transaction of the change
+    that enqueues it and run by the run_jobs worker. Jobs are deleted once
+    run; failed ones are kept with their last error.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUSES = [(PENDING, "Pending"), (RUNNING, "Running"),
+                (FAILED, "Failed")]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"],
+                         name="job_status_run_after_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job {self.name} ({self.status})"
+
+
+class Change(models.Model):
+    """
+    Entry of the append-only change log of clients, contracts, events and
+    notes, saved in the transaction of the change. Its seq, given once the
+    transaction is committed, is the sequence consumers sync from. Contacts
+    are those in charge of the row when it changed, and the former one when
+    it was reassigned.
+    """
+
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+    ACTIONS = [(CREATE, "Create"), (UPDATE, "Update"), (DELETE, "Delete")]
+
+    objects = ChangeQuerySet.as_manager()
+    resource = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    data = models.JSONField(null=True)
+    sales_contact_id = models.BigIntegerField(null=True)
+    support_contact_id = models.BigIntegerField(null=True)
+    previous_contact_id = models.BigIntegerField(null=True)
+    date_created = models.DateTimeField(default=timezone.now)
+    seq = models.BigIntegerField(null=True, unique=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sales_contact_id", "seq"],
+                         name="change_sales_seq_idx"),
+            models.Index(fields=["support_contact_id", "seq"],
+                         name="change_support_seq_idx"),
+            models.Index(fields=["previous_contact_id", "seq"],
+                         name="change_previous_seq_idx"),
+            models.Index(fields=["id"], condition=models.Q(seq=None),
+                         name="change_unsequenced_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.seq}: {self.action} {self.resource} {self.object_id}"
+
+
+class ChangeSequence(models.Model):
+    """
+    Last sequence number given to the change log. Sequencing rounds lock it,
+    so that they number the committed changes one round after the other.
+    """
+
+    last = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Change sequence at {self.last}"
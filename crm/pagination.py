@@ -0,0 +1,158 @@
+import base64
+import json
+import operator
+from collections import OrderedDict
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset (cursor) pagination.
+
+    The cursor is an opaque token holding the ordering values of the last
+    row of the page, so every page is fetched with a single indexed range
+    query instead of an OFFSET scan. The last ordering field must be unique.
+    Querysets annotated with a search_rank are paged by descending rank
+    first.
+    """
+
+    ordering = ("id",)
+    nullable_fields = ()
+    page_size = getattr(settings, "CRM_PAGE_SIZE", 50)
+    max_page_size = getattr(settings, "CRM_MAX_PAGE_SIZE", 500)
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering_fields(queryset)
+        position = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self.get_ordering(self.fields))
+        if position is not None:
+            queryset = queryset.filter(self.get_after_condition(position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering_fields(self, queryset):
+        if "search_rank" in queryset.query.annotations:
+            return ("-search_rank",) + tuple(self.ordering)
+        return tuple(self.ordering)
+
+    def get_ordering(self, fields=None):
+        fields = fields or self.ordering
+        return [
+            F(name).asc(nulls_last=True) if name in self.nullable_fields
+            else name
+            for name in fields
+        ]
+
+    def get_after_condition(self, position):
+        """Builds the lexicographic 'row comes after position' predicate."""
+        conditions = []
+        equal = Q()
+        for field, value in zip(self.fields, position):
+            name = field.lstrip("-")
+            if value is None:
+                # NULLs sort last: only rows still NULL on this field follow.
+                equals = Q(**{f"{name}__isnull": True})
+            else:
+                lookup = "lt" if field.startswith("-") else "gt"
+                greater = Q(**{f"{name}__{lookup}": value})
+                if name in self.nullable_fields:
+                    greater |= Q(**{f"{name}__isnull": True})
+                conditions.append(equal & greater)
+                equals = Q(**{name: value})
+            equal &= equals
+        return reduce(operator.or_, conditions, Q(pk__in=[]))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [getattr(last, field.lstrip("-")) for field in self.fields]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(position))
+
+    def encode_cursor(self, position):
+        values = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in position
+        ]
+        data = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii")
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(encoded.encode("ascii"))
+            values = json.loads(data.decode("utf-8"))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                self.to_python(model, field.lstrip("-"), value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, name, value):
+        if value is None or name == "search_rank":
+            return value
+        return model._meta.get_field(name).to_python(value)
+
+
+class ClientPagination(KeysetPagination):
+    ordering = ("last_name", "id")
+
+
+class ContractPagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class EventPagination(KeysetPagination):
+    ordering = ("event_date", "id")
+    nullable_fields = ("event_date",)
+
+
+class NotePagination(KeysetPagination):
+    ordering = ("id",)
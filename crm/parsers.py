@@ -0,0 +1,34 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework import parsers
+
+from .renderers import JSONRenderer, json_library
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    JSON parser using orjson when available. Bodies orjson rejects are
+    parsed again by the standard library, so that errors read the same.
+    orjson reads integers wider than 64 bits as floats, which the integer
+    fields of the API reject all the same.
+    """
+
+    renderer_class = JSONRenderer
+    library = json_library()
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        # orjson reads UTF-8 only and always rejects NaN and Infinity.
+        if (self.library is None or not self.strict
+                or codecs.lookup(encoding).name != "utf-8"):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return self.library.loads(body)
+        except self.library.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type,
+                                 parser_context)
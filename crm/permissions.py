@@ -18,10 +18,9 @@ class IsManagerOrSalesContact(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        sales_contact = obj.sales_contact
         return (
             True if request.user.role == "management"
-            or sales_contact == request.user
+            or obj.sales_contact_id == request.user.id
             else False
         )
 
@@ -46,10 +45,9 @@ class IsManagerOrSupportContact(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        support_contact = obj.support_contact
         return (
             True if request.user.role == "management"
-            or support_contact == request.user
+            or obj.support_contact_id == request.user.id
             else False
         )
 
@@ -63,6 +61,13 @@ class IsManagerOrEventSupportContact(permissions.BasePermission):
             return True
         return (
             True if request.user.role == "management"
-            or obj.event.support_contact == request.user
+            or obj.event.support_contact_id == request.user.id
             else False
         )
+
+
+class IsSupport(permissions.BasePermission):
+    message = "Event updates can be read only by Support members"
+
+    def has_permission(self, request, view):
+        return True if request.user.role == "support" else False
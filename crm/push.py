@@ -0,0 +1,35 @@
+from django.db.models import Max
+
+from . import changes
+from .broker import get_broker, support_channel
+from .models import Change
+
+
+def notify(support_ids, event_id):
+    """
+    Wakes up the long polls of the support contacts of a changed event. Call
+    it once the change is committed.
+    """
+    broker = get_broker()
+    for support_id in support_ids:
+        broker.publish(support_channel(support_id),
+                       {"resource": "events", "id": event_id})
+
+
+def last_seq():
+    """Sequence number of the last change served by the change log."""
+    return Change.objects.aggregate(seq=Max("seq"))["seq"] or 0
+
+
+def updates(user, since, limit):
+    """Pending changes of the events of a support contact after since."""
+    queryset = Change.objects.visible_to(user).filter(resource="events")
+    return list(changes.change_rows(changes.pending(queryset, since,
+                                                    limit)))
+
+
+def page(results, since):
+    """Response of a long poll, with the since of the next one."""
+    if results:
+        since = results[-1]["seq"]
+    return {"since": since, "results": results}
@@ -0,0 +1,93 @@
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from rest_framework import renderers, serializers
+from rest_framework.utils import encoders
+
+# Fields whose representation of a value reaching the renderer as is must
+# not depend on the JSON library.
+TEMPORAL_FIELDS = (
+    (datetime.datetime, serializers.DateTimeField()),
+    (datetime.date, serializers.DateField()),
+    (datetime.time, serializers.TimeField()),
+)
+
+
+def json_library():
+    """
+    orjson when CRM_JSON_LIBRARY selects it and it is installed, None to
+    use the standard library.
+    """
+    if settings.CRM_JSON_LIBRARY != "orjson":
+        return None
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+class JSONEncoder(encoders.JSONEncoder):
+    """
+    DRF encoder formatting datetimes, dates and times like the serializer
+    fields do, i.e. with DATETIME_FORMAT in the current timezone.
+    """
+
+    def default(self, obj):
+        for value_type, field in TEMPORAL_FIELDS:
+            if isinstance(obj, value_type):
+                return field.to_representation(obj)
+        if isinstance(obj, decimal.Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+class RenderedJSON(bytes):
+    """Response data already rendered by render_json()."""
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer using orjson when available, with the same output as the
+    standard library: compact, UTF-8 and with U+2028 and U+2029 escaped.
+    Only floats in exponent notation read differently, e.g. 1e16, and
+    orjson renders NaN as null. Indented or ASCII-only documents and values
+    orjson cannot encode are rendered with the standard library.
+    RenderedJSON data is sent as is.
+    """
+
+    encoder_class = JSONEncoder
+    library = json_library()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if isinstance(data, RenderedJSON):
+            if indent is None:
+                return bytes(data)
+            data = json.loads(data)
+
+        fast = (self.library is not None and indent is None
+                and self.compact and not self.ensure_ascii)
+        if fast and data is not None:
+            orjson = self.library
+            try:
+                ret = orjson.dumps(data, default=self.encoder_class().default,
+                                   option=orjson.OPT_PASSTHROUGH_DATETIME
+                                   | orjson.OPT_NON_STR_KEYS)
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                    b"\xe2\x80\xa9", b"\\u2029")
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+def render_json(data):
+    """
+    Renders data the way JSONRenderer renders a response, so that a page
+    can be cached and sent as rendered.
+    """
+    return RenderedJSON(JSONRenderer().render(data))
@@ -0,0 +1,150 @@
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import (Count, F, FloatField, IntegerField, OuterRef,
+                              Q, Subquery, Sum)
+from django.db.models.functions import Coalesce
+
+from .models import Client, ClientRollup, Contract, Event, Note
+
+FIELDS = ("open_contracts", "signed_contracts", "signed_amount",
+          "upcoming_events", "notes")
+
+
+def aggregate_of(model, client_path, aggregate, condition=Q(),
+                 output_field=IntegerField):
+    """Aggregate of the rows of a model belonging to the outer client."""
+    rows = model.objects.filter(condition, **{client_path: OuterRef("pk")})
+    return Coalesce(
+        Subquery(rows.order_by().values(client_path).annotate(
+            value=aggregate).values("value")),
+        0,
+        output_field=output_field(),
+    )
+
+
+def rollup_annotations(contract_model, event_model, note_model):
+    """Rollup fields of a client computed from its rows."""
+    return {
+        "open_contracts": aggregate_of(contract_model, "client", Count("id"),
+                                       Q(status=False)),
+        "signed_contracts": aggregate_of(contract_model, "client",
+                                         Count("id"), Q(status=True)),
+        "signed_amount": aggregate_of(contract_model, "client",
+                                      Sum("amount"), Q(status=True),
+                                      FloatField),
+        "upcoming_events": aggregate_of(event_model, "client", Count("id"),
+                                        Q(event_over=False)),
+        "notes": aggregate_of(note_model, "event__client", Count("id")),
+    }
+
+
+def rebuild(client_ids=None, batch_size=2000):
+    """
+    Recomputes the rollups of some clients, of every client by default, in
+    a single query over the clients.
+    """
+    clients = Client.objects.all()
+    rollups = ClientRollup.objects.all()
+    if client_ids is not None:
+        clients = clients.filter(id__in=client_ids)
+        rollups = rollups.filter(client_id__in=client_ids)
+    rows = clients.annotate(
+        **rollup_annotations(Contract, Event, Note)
+    ).values("id", *FIELDS).iterator(chunk_size=batch_size)
+    count = 0
+    with transaction.atomic():
+        rollups.delete()
+        while True:
+            batch = [ClientRollup(client_id=row.pop("id"), **row)
+                     for row in islice(rows, batch_size)]
+            if not batch:
+                return count
+            ClientRollup.objects.bulk_create(batch)
+            count += len(batch)
+
+
+def create_empty(client_ids):
+    """Creates the empty rollups of clients just created."""
+    ClientRollup.objects.bulk_create([ClientRollup(client_id=client_id)
+                                      for client_id in client_ids])
+
+
+def add(client_id, deltas):
+    """Adds deltas to the rollup of a client in one UPDATE statement."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if client_id is None or not deltas:
+        return
+    ClientRollup.objects.filter(client_id=client_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def contribution(row):
+    """Client of a contract or an event, and what it adds to its rollup."""
+    if isinstance(row, Contract):
+        return row.client_id, {
+            "open_contracts": 0 if row.status else 1,
+            "signed_contracts": 1 if row.status else 0,
+            "signed_amount": float(row.amount) if row.status else 0,
+        }
+    return row.client_id, {"upcoming_events": 0 if row.event_over else 1}
+
+
+def apply(signed_rows):
+    """
+    Adds the contributions of (contract or event, sign) pairs to the
+    rollups, with one UPDATE per client. A sign of -1 removes the row.
+    """
+    deltas = defaultdict(Counter)
+    for row, sign in signed_rows:
+        client_id, values = contribution(row)
+        for field, value in values.items():
+            deltas[client_id][field] += sign * value
+    for client_id, values in deltas.items():
+        add(client_id, values)
+
+
+def add_rows(rows):
+    """Adds contracts or events created without post_save signal."""
+    apply((row, 1) for row in rows)
+
+
+def replace(previous, current):
+    """
+    Moves the contribution of a contract or an event from its previous
+    state to its current one, None standing for a missing row.
+    """
+    apply((row, sign) for row, sign in ((previous, -1), (current, 1))
+          if row is not None)
+
+
+def move_notes(previous, event):
+    """Moves the notes of an event given to another client."""
+    if previous is None or previous.client_id == event.client_id:
+        return
+    count = Note.objects.filter(event=event).count()
+    add(previous.client_id, {"notes": -count})
+    add(event.client_id, {"notes": count})
+
+
+def add_notes(event_id, count):
+    """Adds notes to the rollup of the client of an event."""
+    if event_id is None or not count:
+        return
+    ClientRollup.objects.filter(client__event=event_id).update(
+        notes=F("notes") + count)
+
+
+def sales_contact_summary(clients):
+    """Rollups of some clients summed by sales contact."""
+    return ClientRollup.objects.filter(
+        client__in=clients.values("id")
+    ).values(
+        sales_contact=F("client__sales_contact"),
+        username=F("client__sales_contact__username"),
+    ).annotate(
+        clients=Count("client"),
+        **{field: Sum(field) for field in FIELDS},
+    ).order_by("sales_contact")
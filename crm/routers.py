@@ -0,0 +1,61 @@
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Replica read by the request being served, None to read from the primary.
+replica = contextvars.ContextVar("crm_replica", default=None)
+
+
+def pinned_key(user_id):
+    return f"crm-replica:pinned:{user_id}"
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of the requests flagged by ReplicaRoutingMixin to a
+    replica, every other query to the primary database.
+    """
+
+    def db_for_read(self, model, **hints):
+        return replica.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMixin:
+    """
+    Serves the safe requests of a view from one of DATABASE_REPLICAS, unless
+    the user wrote in the last CRM_REPLICA_STICKY_SECONDS, so that users
+    always read their own writes.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = replica.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS and settings.DATABASE_REPLICAS
+                and not cache.get(pinned_key(request.user.id))):
+            # One replica per request, for consistent reads.
+            replica.set(random.choice(settings.DATABASE_REPLICAS))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in SAFE_METHODS
+                and request.user.is_authenticated):
+            cache.set(pinned_key(request.user.id), True,
+                      settings.CRM_REPLICA_STICKY_SECONDS)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,64 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity
+)
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest
+
+SEARCH_CONFIG = "english"
+
+
+def is_postgresql(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def contains_any(fields, value):
+    """Case-insensitive containment on any of the fields."""
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": value})
+    return condition
+
+
+def trigram_search(queryset, fields, value):
+    """
+    Filters short text fields containing the search term and ranks them by
+    trigram similarity.
+
+    On PostgreSQL the containment test is served by the pg_trgm GIN indexes
+    on UPPER(field). Other databases fall back to a plain, unranked
+    containment test.
+    """
+    queryset = queryset.filter(contains_any(fields, value))
+    if not is_postgresql(queryset):
+        return queryset.annotate(search_rank=Value(1.0, FloatField()))
+
+    similarities = [TrigramSimilarity(field, value) for field in fields]
+    if len(similarities) > 1:
+        rank = Greatest(*similarities)
+    else:
+        rank = similarities[0]
+    return queryset.annotate(search_rank=Cast(rank, FloatField()))
+
+
+def full_text_search(queryset, field, value):
+    """
+    Filters long text fields matching the search terms and ranks them with
+    ts_rank.
+
+    On PostgreSQL the match is served by the GIN index on the field's
+    tsvector. Other databases fall back to a plain, unranked containment
+    test.
+    """
+    if not is_postgresql(queryset):
+        return queryset.filter(contains_any([field], value)).annotate(
+            search_rank=Value(1.0, FloatField()))
+
+    vector = SearchVector(field, config=SEARCH_CONFIG)
+    query = SearchQuery(value, config=SEARCH_CONFIG)
+    return queryset.alias(search_vector=vector).filter(
+        search_vector=query
+    ).annotate(search_rank=Cast(SearchRank(vector, query), FloatField()))
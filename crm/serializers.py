@@ -2,25 +2,65 @@ from rest_framework import serializers
 
 from accounts.models import User
 
+from .metrics import TimedSerializerMixin
 from .models import Client, Contract, Event, Note
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the list of clients."""
 
     class Meta:
         model = Client
         exclude = ("date_created", "date_updated")
+        summary_fields = ["id", "first_name", "last_name", "company"]
 
 
-class ContractSerializer(serializers.ModelSerializer):
+class ClientBulkSerializer(serializers.ModelSerializer):
+    """Serializer validating the fields of clients created in bulk."""
+
+    class Meta:
+        model = Client
+        exclude = ("date_created", "date_updated", "sales_contact")
+
+
+class ClientSummarySerializer(TimedSerializerMixin,
+                              serializers.ModelSerializer):
+    """Serializer for the dashboard summary of clients."""
+
+    open_contracts = serializers.IntegerField(
+        source="rollup.open_contracts", read_only=True)
+    signed_contracts = serializers.IntegerField(
+        source="rollup.signed_contracts", read_only=True)
+    signed_amount = serializers.FloatField(
+        source="rollup.signed_amount", read_only=True)
+    upcoming_events = serializers.IntegerField(
+        source="rollup.upcoming_events", read_only=True)
+    notes = serializers.IntegerField(source="rollup.notes", read_only=True)
+
+    class Meta:
+        model = Client
+        fields = ["id", "first_name", "last_name", "company",
+                  "sales_contact", "open_contracts", "signed_contracts",
+                  "signed_amount", "upcoming_events", "notes"]
+
+
+class ContractSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the list of contracts."""
     class Meta:
         model = Contract
         exclude = ("date_created", "date_updated")
+        summary_fields = ["id", "client", "status", "amount", "payment_due"]
 
 
-class UserSerializer(serializers.ModelSerializer):
+class ContractBulkSerializer(serializers.ModelSerializer):
+    """Serializer validating the fields of contracts created in bulk."""
+
+    class Meta:
+        model = Contract
+        exclude = ("date_created", "date_updated", "client", "sales_contact")
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the User model."""
 
     class Meta:
@@ -44,17 +84,27 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the list of notes."""
 
     class Meta:
         model = Note
         fields = ["id", "description"]
+        summary_fields = ["id", "description"]
+
+
+class NoteChangeSerializer(serializers.ModelSerializer):
+    """Serializer for the notes of the change feed, with their event."""
+
+    class Meta:
+        model = Note
+        fields = ["id", "description", "event"]
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the list of events."""
 
     class Meta:
         model = Event
         exclude = ("date_created", "date_updated")
+        summary_fields = ["id", "client", "event_date", "event_over"]
@@ -0,0 +1,208 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import changes, jobs, push, rollups, visibility
+from .cache import RESOURCES, list_cache
+from .models import Change, Client, ClientRollup, Contract, Event, Note
+
+
+def previous_value(instance, field):
+    """Value of a field before the save of an existing row."""
+    if instance.pk is None:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(
+        field, flat=True).first()
+
+
+def previous_row(instance):
+    """Existing row as saved in the database, before its save."""
+    if instance.pk is None:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).first()
+
+
+@receiver(pre_save, sender=Client)
+def remember_sales_contact(sender, instance, **kwargs):
+    instance._previous_contact_id = previous_value(instance,
+                                                   "sales_contact_id")
+
+
+@receiver(pre_save, sender=Contract)
+def remember_contract(sender, instance, **kwargs):
+    instance._previous = previous_row(instance)
+    instance._previous_contact_id = getattr(instance._previous,
+                                            "sales_contact_id", None)
+
+
+@receiver(pre_save, sender=Event)
+def remember_event(sender, instance, **kwargs):
+    instance._previous = previous_row(instance)
+    instance._previous_contact_id = getattr(instance._previous,
+                                            "support_contact_id", None)
+
+
+@receiver(pre_save, sender=Note)
+def remember_note_event(sender, instance, **kwargs):
+    instance._previous_event_id = previous_value(instance, "event_id")
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_client_lists(sender, instance, **kwargs):
+    sales_ids = (instance.sales_contact_id,
+                 getattr(instance, "_previous_contact_id", None))
+    support_ids = Event.objects.filter(client_id=instance.pk).values_list(
+        "support_contact_id", flat=True)
+    list_cache.invalidate(["clients"], [*sales_ids, *support_ids])
+    list_cache.invalidate(["events", "notes"], sales_ids)
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+def invalidate_contract_lists(sender, instance, **kwargs):
+    list_cache.invalidate(["contracts"], [
+        instance.sales_contact_id,
+        getattr(instance, "_previous_contact_id", None),
+    ])
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_lists(sender, instance, **kwargs):
+    support_ids = (instance.support_contact_id,
+                   getattr(instance, "_previous_contact_id", None))
+    sales_id = Client.objects.filter(id=instance.client_id).values_list(
+        "sales_contact_id", flat=True).first()
+    list_cache.invalidate(["events", "notes"], [*support_ids, sales_id])
+    list_cache.invalidate(["clients"], support_ids)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_note_lists(sender, instance, **kwargs):
+    contacts = Event.objects.filter(id=instance.event_id).values_list(
+        "support_contact_id", "client__sales_contact_id").first()
+    list_cache.invalidate(["notes"], contacts or ())
+
+
+@receiver(post_save, sender=Client)
+def create_client_rollup(sender, instance, created, **kwargs):
+    if created:
+        ClientRollup.objects.create(client=instance)
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_save, sender=Event)
+def update_rollups(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous", None)
+    rollups.replace(previous, instance)
+    if sender is Event:
+        rollups.move_notes(previous, instance)
+
+
+@receiver(post_save, sender=Client)
+def reindex_client_visibility(sender, instance, created, **kwargs):
+    previous_id = getattr(instance, "_previous_contact_id", None)
+    if not created and previous_id != instance.sales_contact_id:
+        visibility.index_client(instance)
+
+
+@receiver(post_save, sender=Event)
+def reindex_event_visibility(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous", None)
+    if (created or previous is None
+            or previous.client_id != instance.client_id
+            or previous.support_contact_id != instance.support_contact_id):
+        visibility.index_event(instance)
+
+
+@receiver(post_save, sender=Contract)
+def enqueue_signing_jobs(sender, instance, **kwargs):
+    # Runs in the transaction of the save: the job is only kept with it.
+    previous = getattr(instance, "_previous", None)
+    if instance.status and not getattr(previous, "status", False):
+        jobs.enqueue("contract_signed", contract_id=instance.pk,
+                     client_id=instance.client_id)
+
+
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=Event)
+def remove_from_rollups(sender, instance, **kwargs):
+    rollups.replace(instance, None)
+
+
+@receiver(post_save, sender=Note)
+def update_note_rollups(sender, instance, created, **kwargs):
+    previous_event_id = getattr(instance, "_previous_event_id", None)
+    if created or previous_event_id != instance.event_id:
+        rollups.add_notes(previous_event_id, -1)
+        rollups.add_notes(instance.event_id, 1)
+
+
+@receiver(pre_delete, sender=Note)
+def remember_note_client(sender, instance, **kwargs):
+    # The event of the note may be deleted first when cascading.
+    instance._client_id = Event.objects.filter(
+        id=instance.event_id).values_list("client_id", flat=True).first()
+
+
+@receiver(post_delete, sender=Note)
+def remove_note_from_rollups(sender, instance, **kwargs):
+    rollups.add(getattr(instance, "_client_id", None), {"notes": -1})
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Contract)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Note)
+def log_save(sender, instance, created, **kwargs):
+    changes.record(instance, Change.CREATE if created else Change.UPDATE)
+
+
+@receiver(pre_delete, sender=Client)
+@receiver(pre_delete, sender=Contract)
+@receiver(pre_delete, sender=Event)
+@receiver(pre_delete, sender=Note)
+def remember_audience(sender, instance, **kwargs):
+    # Related rows may be deleted first when cascading.
+    instance._audience = changes.audience(instance)
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Note)
+def log_delete(sender, instance, **kwargs):
+    changes.record(instance, Change.DELETE,
+                   getattr(instance, "_audience", None))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def notify_support_contacts(sender, instance, **kwargs):
+    # The long polls read the change log: they are woken up once the change
+    # is committed.
+    support_ids = {instance.support_contact_id,
+                   getattr(instance, "_previous_contact_id", None)}
+    support_ids.discard(None)
+    if support_ids:
+        transaction.on_commit(partial(push.notify, support_ids,
+                                      instance.pk))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_lists(sender, instance, **kwargs):
+    list_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_lists_of_deleted_user(sender, instance, **kwargs):
+    # Deleting a user sets the contact of their rows to NULL without
+    # sending any signal, which changes the lists of Management.
+    list_cache.invalidate_user(instance.pk)
+    list_cache.invalidate(RESOURCES)
@@ -0,0 +1,1146 @@
+import asyncio
+import base64
+import datetime
+import decimal
+import importlib
+import io
+import json
+import threading
+import time
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.apps import apps
+from django.conf import settings
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.directory import UserDirectory, user_directory
+from accounts.models import User
+
+from . import changes, jobs, push, visibility
+from .backends.pool import pools
+from .compiled import compile_serializer
+from .exceptions import (
+    CannotCreateNote,
+    NotInChargeOfClient,
+    NotInChargeOfContract,
+    NotInChargeOfEvent,
+    NotSalesMember,
+    NotSupportMember
+)
+from .models import (Change, Client, ClientRollup, Contract, Event, Job,
+                     Note, Visibility)
+from .pagination import KeysetPagination
+from .permissions import IsManagerOrContractSalesContact
+from .parsers import JSONParser
+from .renderers import JSONRenderer, json_library, render_json
+from .serializers import (ClientSerializer, ContractSerializer,
+                          EventSerializer, NoteSerializer)
+from .views import ClientViewSet
+
+# Queries of a note creation: the event checked with the visibility of the
+# user, the insert, then the list cache, rollup and change log receivers.
+CREATE_NOTE_QUERIES = 6
+
+# Statements of the transactions and savepoints, which the tests wrap every
+# request in and which are not queries of the views.
+TRANSACTION_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE SAVEPOINT",
+                          "ROLLBACK TO SAVEPOINT")
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Users of each role, and a client of the sales contact with a contract
+    and an event of the support contact, with a note.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user("manager", role="management")
+        cls.sales = User.objects.create_user("sales", role="sales")
+        cls.other_sales = User.objects.create_user("other-sales",
+                                                   role="sales")
+        cls.support = User.objects.create_user("support", role="support")
+        cls.other_support = User.objects.create_user("other-support",
+                                                     role="support")
+        cls.crm_client = cls.create_client(cls.sales)
+        cls.contract = Contract.objects.create(
+            client=cls.crm_client, sales_contact=cls.sales, amount=100,
+            payment_due="2030-01-01T00:00:00Z")
+        cls.event = Event.objects.create(client=cls.crm_client,
+                                         support_contact=cls.support,
+                                         attendees=10)
+        cls.note = Note.objects.create(event=cls.event, description="Menu")
+
+    @staticmethod
+    def create_client(sales_contact):
+        return Client.objects.create(
+            first_name="Ada", last_name="Lovelace", email="ada@example.com",
+            phone="0100000000", mobile="0600000000", company="Analytical",
+            sales_contact=sales_contact)
+
+    def request(self, user, method, path, data=None, **extra):
+        """Response of a request and the number of queries it ran."""
+        api = APIClient()
+        api.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(api, method)(path, data, format="json",
+                                            **extra)
+        queries = [query for query in context.captured_queries
+                   if not query["sql"].startswith(TRANSACTION_STATEMENTS)]
+        return response, len(queries)
+
+    def assertQueries(self, count, user, path, method="get", data=None,
+                      status=200, **extra):
+        # Lists would be answered from the cache of a previous request.
+        cache.clear()
+        response, queries = self.request(user, method, path, data, **extra)
+        self.assertEqual(response.status_code, status, response.content)
+        self.assertEqual(queries, count, f"{method.upper()} {path}")
+        return response
+
+
+class SupportScopeQueryCountTest(QueryCountTestCase):
+    """
+    Support contacts read clients through their events: the number of
+    queries must not grow with the number of events they support.
+    """
+
+    def support_clients(self, events):
+        """Clients of as many events of the support contact."""
+        Event.objects.filter(support_contact=self.support).delete()
+        clients = [self.create_client(self.sales) for _ in range(events)]
+        for crm_client in clients:
+            Event.objects.create(client=crm_client,
+                                 support_contact=self.support, attendees=10)
+        return clients
+
+    def test_client_list(self):
+        for events in (1, 20):
+            with self.subTest(events=events):
+                self.support_clients(events)
+                response = self.assertQueries(1, self.support,
+                                              "/crm/v1/clients/")
+                self.assertEqual(len(response.json()["results"]), events)
+
+    def test_client_retrieve(self):
+        for events in (1, 20):
+            with self.subTest(events=events):
+                crm_client = self.support_clients(events)[-1]
+                self.assertQueries(1, self.support,
+                                   f"/crm/v1/clients/{crm_client.id}/")
+
+
+class PaginationTest(QueryCountTestCase):
+    """
+    Walking the cursors of a list returns every row once, in order, NULLs
+    and search ranks included; cursors the API did not give are rejected.
+    """
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def walk(self, path, params):
+        """Ids of every page of a list, following the next links."""
+        ids = []
+        response = self.api.get(path, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page["results"]), params["page_size"])
+            ids += [row["id"] for row in page["results"]]
+            if page["next"] is None:
+                return ids
+            response = self.api.get(page["next"])
+
+    def test_events_with_null_dates(self):
+        for day in (3, None, 1, 3, None, 2):
+            Event.objects.create(
+                client=self.crm_client, attendees=1,
+                event_date=day and f"2030-01-0{day}T00:00:00Z")
+        expected = list(Event.objects.order_by(
+            F("event_date").asc(nulls_last=True), "id").values_list(
+                "id", flat=True))
+        self.assertEqual(self.walk("/crm/v1/events/", {"page_size": 2}),
+                         expected)
+
+    def test_search(self):
+        for name in ("Lovell", "Byron", "Lovelace", "Loveday", "Somerville"):
+            client = self.create_client(self.sales)
+            client.last_name = name
+            client.save()
+        ids = self.walk("/crm/v1/clients/", {"search": "love",
+                                             "page_size": 2})
+        self.assertEqual(sorted(ids), sorted(Client.objects.filter(
+            last_name__icontains="love").values_list("id", flat=True)))
+
+    def test_invalid_cursors(self):
+        Event.objects.create(client=self.crm_client, attendees=1)
+        response = self.api.get("/crm/v1/events/", {"page_size": 1})
+        cursor, = parse_qs(urlsplit(response.json()["next"]).query)["cursor"]
+        tampered = base64.urlsafe_b64encode(b'["tomorrow",1]').decode()
+        for cursor in ("not-a-cursor", tampered, cursor[:-4],
+                       base64.urlsafe_b64encode(b"[1]").decode()):
+            with self.subTest(cursor=cursor):
+                response = self.api.get("/crm/v1/events/",
+                                        {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()["detail"],
+                                 KeysetPagination.invalid_cursor_message)
+
+    @mock.patch.object(KeysetPagination, "page_size", 2)
+    @mock.patch.object(KeysetPagination, "max_page_size", 3)
+    def test_page_size(self):
+        for _ in range(4):
+            self.create_client(self.sales)
+        for page_size, expected in (("1", 1), ("3", 3), ("50", 3), ("0", 2),
+                                    ("-1", 2), ("many", 2)):
+            with self.subTest(page_size=page_size):
+                response = self.api.get("/crm/v1/clients/",
+                                        {"page_size": page_size})
+                self.assertEqual(len(response.json()["results"]), expected)
+
+
+class ListCacheTest(QueryCountTestCase):
+    """
+    Cached list pages are served until a row they show, or should show,
+    changes or moves to another contact.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, user, path, cached=False):
+        """Ids of a list page, checking whether it came from the cache."""
+        response, queries = self.request(user, "get", path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries == 0, cached, path)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_update(self):
+        path = "/crm/v1/clients/"
+        self.ids(self.sales, path)
+        self.ids(self.sales, path, cached=True)
+        self.crm_client.company = "Difference Engine"
+        self.crm_client.save()
+        response, _ = self.request(self.sales, "get", path)
+        self.assertEqual(response.json()["results"][0]["company"],
+                         "Difference Engine")
+
+    def test_reassignment(self):
+        path = "/crm/v1/clients/"
+        for user in (self.sales, self.other_sales):
+            self.ids(user, path)
+        self.crm_client.sales_contact = self.other_sales
+        self.crm_client.save()
+        self.assertEqual(self.ids(self.sales, path), [])
+        self.assertEqual(self.ids(self.other_sales, path),
+                         [self.crm_client.id])
+
+    def test_delete(self):
+        path = "/crm/v1/contracts/"
+        self.assertEqual(self.ids(self.sales, path), [self.contract.id])
+        self.contract.delete()
+        self.assertEqual(self.ids(self.sales, path), [])
+
+    def test_support_contact_loses_event(self):
+        paths = ("/crm/v1/clients/", "/crm/v1/events/")
+        for path in paths:
+            self.ids(self.support, path)
+            self.ids(self.support, path, cached=True)
+        self.event.support_contact = self.other_support
+        self.event.save()
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertEqual(self.ids(self.support, path), [])
+
+
+class ConditionalListTest(QueryCountTestCase):
+    """
+    The ETag of a list page is that of its content: it costs no query, and
+    changes with any row of the page.
+    """
+
+    path = "/crm/v1/clients/"
+
+    def test_not_modified(self):
+        response = self.assertQueries(1, self.sales, self.path)
+        etag = response["ETag"]
+        self.assertQueries(1, self.sales, self.path, status=304,
+                           HTTP_IF_NONE_MATCH=etag)
+
+        Client.objects.filter(id=self.crm_client.id).update(company="Babbage")
+        response = self.assertQueries(1, self.sales, self.path)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class DetailQueryCountTest(QueryCountTestCase):
+    """
+    A detail reads its object and whether the user can read it in one
+    query, telling a missing object (404) from one the user is not in
+    charge of (403).
+    """
+
+    def paths(self):
+        """Path of each detail, of a missing object, and its exception."""
+        event = self.event.id
+        return {
+            "client": (f"/crm/v1/clients/{self.crm_client.id}/",
+                       "/crm/v1/clients/999999/", NotInChargeOfClient),
+            "contract": (f"/crm/v1/contracts/{self.contract.id}/",
+                         "/crm/v1/contracts/999999/", NotInChargeOfContract),
+            "event": (f"/crm/v1/events/{event}/", "/crm/v1/events/999999/",
+                      NotInChargeOfEvent),
+            "note": (f"/crm/v1/events/{event}/notes/{self.note.id}/",
+                     f"/crm/v1/events/{event}/notes/999999/",
+                     NotInChargeOfEvent),
+        }
+
+    def assertDetails(self, user, readable, denied=()):
+        """
+        Checks the details of the readable resources, of those the viewset
+        denies to the user, and of the others, which the user is not in
+        charge of.
+        """
+        for name, (path, missing, exception) in self.paths().items():
+            with self.subTest(user=user.username, resource=name):
+                if name in readable:
+                    self.assertQueries(1, user, path)
+                    self.assertQueries(1, user, missing, status=404)
+                elif name in denied:
+                    response = self.assertQueries(0, user, path, status=403)
+                    self.assertEqual(response.json()["detail"],
+                                     IsManagerOrContractSalesContact.message)
+                else:
+                    response = self.assertQueries(1, user, path, status=403)
+                    self.assertEqual(response.json()["detail"],
+                                     exception.default_detail)
+
+    def test_manager(self):
+        self.assertDetails(self.manager, self.paths())
+
+    def test_sales_contact(self):
+        self.assertDetails(self.sales, self.paths())
+
+    def test_other_sales(self):
+        self.assertDetails(self.other_sales, ())
+
+    def test_support_contact(self):
+        self.assertDetails(self.support, ("client", "event", "note"),
+                           denied=("contract",))
+
+    def test_other_support(self):
+        self.assertDetails(self.other_support, (), denied=("contract",))
+
+
+class NoteQueryCountTest(QueryCountTestCase):
+    """Note lists check their event, then read the page of notes."""
+
+    def path(self, event_id=None):
+        return f"/crm/v1/events/{event_id or self.event.id}/notes/"
+
+    def test_list(self):
+        for user in (self.manager, self.sales, self.support):
+            with self.subTest(user=user.username):
+                response = self.assertQueries(2, user, self.path())
+                self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_list_denied(self):
+        for user in (self.other_sales, self.other_support):
+            with self.subTest(user=user.username):
+                response = self.assertQueries(1, user, self.path(),
+                                              status=403)
+                self.assertEqual(response.json()["detail"],
+                                 NotInChargeOfEvent.default_detail)
+        self.assertQueries(1, self.manager, self.path(999999), status=404)
+
+    def test_create(self):
+        for user in (self.manager, self.support):
+            with self.subTest(user=user.username):
+                self.assertQueries(CREATE_NOTE_QUERIES, user, self.path(),
+                                   "post", {"description": "Stage"},
+                                   status=201)
+
+    def test_create_denied(self):
+        response = self.assertQueries(1, self.other_support, self.path(),
+                                      "post", {"description": "Stage"},
+                                      status=403)
+        self.assertEqual(response.json()["detail"],
+                         NotInChargeOfEvent.default_detail)
+        response = self.assertQueries(1, self.sales, self.path(), "post",
+                                      {"description": "Stage"}, status=403)
+        self.assertEqual(response.json()["detail"],
+                         CannotCreateNote.default_detail)
+        self.assertQueries(1, self.support, self.path(999999), "post",
+                           {"description": "Stage"}, status=404)
+
+
+class CompiledSerializerTest(QueryCountTestCase):
+    """
+    Compiled serializers render the bytes the DRF serializers render, in
+    any timezone and for sparse fieldsets.
+    """
+
+    serializers = {Client: ClientSerializer, Contract: ContractSerializer,
+                   Event: EventSerializer, Note: NoteSerializer}
+
+    def setUp(self):
+        Event.objects.create(client=self.crm_client, attendees=5,
+                             event_date="2030-06-01T22:30:00Z")
+        Contract.objects.create(client=self.crm_client, amount=99.5,
+                                payment_due="2030-01-01T23:45:00Z",
+                                status=True)
+
+    def assertSameBytes(self, serializer_class, fields=None):
+        model = serializer_class.Meta.model
+        queryset = model.objects.order_by("id")
+        compiled = compile_serializer(serializer_class, fields)
+        self.assertIsNotNone(compiled)
+        expected = serializer_class(queryset, many=True).data
+        if fields:
+            expected = [{name: row[name] for name in fields}
+                        for row in expected]
+        self.assertEqual(
+            bytes(render_json(compiled.render(
+                queryset.values_list(*compiled.columns)))),
+            DRFJSONRenderer().render(expected))
+
+    def test_serializers(self):
+        for zone in ("UTC", "America/Los_Angeles", "Asia/Kolkata"):
+            for serializer_class in self.serializers.values():
+                with self.subTest(serializer=serializer_class.__name__,
+                                  zone=zone), timezone.override(zone):
+                    self.assertSameBytes(serializer_class)
+
+    def test_sparse_fields(self):
+        self.assertSameBytes(ClientSerializer, ("company", "id"))
+        self.assertSameBytes(EventSerializer, ("event_date", "client"))
+
+    def test_lists(self):
+        paths = {Client: "/crm/v1/clients/", Contract: "/crm/v1/contracts/",
+                 Event: "/crm/v1/events/",
+                 Note: f"/crm/v1/events/{self.event.id}/notes/"}
+        for model, path in paths.items():
+            with self.subTest(path=path):
+                response = self.assertQueries(1 + (model is Note),
+                                              self.manager, path)
+                expected = self.serializers[model](
+                    model.objects.all(), many=True).data
+                self.assertEqual(
+                    sorted(response.json()["results"],
+                           key=lambda row: row["id"]),
+                    sorted(json.loads(DRFJSONRenderer().render(expected)),
+                           key=lambda row: row["id"]))
+
+
+@skipUnless(json_library(), "Needs orjson.")
+class JSONLibraryTest(TestCase):
+    """orjson renders and parses the documents the standard library does."""
+
+    document = {
+        "name": "Salle\u2028des f\u00eates \u2029\U0001f389",
+        "date": datetime.datetime(2030, 1, 1, 10, 30, 15, 123456,
+                                  tzinfo=datetime.timezone.utc),
+        "day": datetime.date(2030, 1, 1),
+        "time": datetime.time(10, 30),
+        "amount": decimal.Decimal("1234.50"),
+        "rows": [{"id": 1, "over": False, "ratio": 0.25, "note": None}],
+    }
+
+    def render(self, library, data, **context):
+        with mock.patch.object(JSONRenderer, "library", library):
+            return JSONRenderer().render(data, renderer_context=context)
+
+    def parse(self, library, body):
+        with mock.patch.object(JSONParser, "library", library):
+            return JSONParser().parse(io.BytesIO(body))
+
+    def test_render(self):
+        for zone in ("UTC", "Asia/Kolkata"):
+            with self.subTest(zone=zone), timezone.override(zone):
+                self.assertEqual(
+                    self.render(json_library(), self.document),
+                    self.render(None, self.document))
+        self.assertEqual(self.render(json_library(), self.document,
+                                     indent=2),
+                         self.render(None, self.document, indent=2))
+
+    def test_parse(self):
+        body = self.render(None, self.document)
+        self.assertEqual(self.parse(json_library(), body),
+                         self.parse(None, body))
+        for body in (b'{"name": ', b"[NaN]"):
+            with self.subTest(body=body):
+                errors = []
+                for library in (json_library(), None):
+                    with self.assertRaises(ParseError) as context:
+                        self.parse(library, body)
+                    errors.append(str(context.exception))
+                self.assertEqual(errors[0], errors[1])
+
+
+class BulkCreateTest(QueryCountTestCase):
+    """
+    Bulk creations are all or nothing: one invalid item saves no row and
+    reports its errors at its own index.
+    """
+
+    def client_item(self, index):
+        return {"first_name": "Bulk", "last_name": f"Lead {index}",
+                "email": "lead@example.com", "phone": "0100000000",
+                "mobile": "0600000000", "company": "Bulk import"}
+
+    def counts(self):
+        return [model.objects.count()
+                for model in (Client, Contract, Note, Change, Job)]
+
+    def assertRejected(self, user, path, items, index, field):
+        before = self.counts()
+        response, _ = self.request(user, "post", path, items)
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(len(errors), len(items))
+        self.assertIn(field, errors[index])
+        self.assertEqual([error for position, error in enumerate(errors)
+                          if position != index], [{}] * (len(items) - 1))
+        self.assertEqual(self.counts(), before)
+
+    def test_clients(self):
+        items = [self.client_item(index) for index in range(3)]
+        del items[1]["email"]
+        self.assertRejected(self.sales, "/crm/v1/clients/bulk/", items, 1,
+                            "email")
+
+    def test_contracts(self):
+        other_client = self.create_client(self.other_sales)
+        items = [{"client": client.id, "amount": 1000, "status": True,
+                  "payment_due": "2100-01-01T10:00"}
+                 for client in (self.crm_client, self.crm_client,
+                                other_client)]
+        self.assertRejected(self.sales, "/crm/v1/contracts/bulk/", items, 2,
+                            "client")
+
+    def test_failure_after_insert(self):
+        items = [self.client_item(index) for index in range(3)]
+        before = self.counts()
+        with mock.patch.object(changes, "record_created",
+                               side_effect=RuntimeError("Log full")):
+            with self.assertRaises(RuntimeError):
+                self.request(self.sales, "post", "/crm/v1/clients/bulk/",
+                             items)
+        self.assertEqual(self.counts(), before)
+
+    def test_notes(self):
+        items = [{"description": "Stage"}, {"description": ""},
+                 {"description": "Lights"}]
+        self.assertRejected(self.support,
+                            f"/crm/v1/events/{self.event.id}/notes/bulk/",
+                            items, 1, "description")
+
+
+class UserDirectoryTest(QueryCountTestCase):
+    """
+    Role checks read the user directory, which follows role changes made
+    in this process at once and those of other processes within its ttl.
+    """
+
+    def create_client_of(self, sales_contact_id):
+        response, _ = self.request(
+            self.manager, "post", "/crm/v1/clients/", {
+                "first_name": "Ada", "last_name": "Byron",
+                "email": "ada@example.com", "phone": "0100000000",
+                "mobile": "0600000000", "company": "Analytical",
+                "sales_contact": sales_contact_id})
+        return response
+
+    def test_no_query(self):
+        user_directory.warm()
+        with self.assertNumQueries(0):
+            self.assertTrue(user_directory.has_role(self.sales.id, "sales"))
+            self.assertEqual(user_directory.members("support"),
+                             {self.support.id, self.other_support.id})
+            self.assertIsNone(user_directory.role_of(999999))
+
+    def test_role_change(self):
+        self.assertEqual(self.create_client_of(self.support.id).status_code,
+                         403)
+        self.support.role = "sales"
+        self.support.save()
+        self.assertEqual(self.create_client_of(self.support.id).status_code,
+                         201)
+        self.support.delete()
+        response = self.create_client_of(self.support.id)
+        self.assertEqual(response.json()["detail"],
+                         NotSalesMember.default_detail)
+
+    def test_missing_support_contact(self):
+        response, _ = self.request(
+            self.manager, "put", f"/crm/v1/events/{self.event.id}/", {
+                "support_contact": 999999, "attendees": 10})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["detail"],
+                         NotSupportMember.default_detail)
+
+    def test_ttl(self):
+        directory = UserDirectory(ttl=60)
+        directory.warm()
+        # Created by another process, which invalidates its own directory.
+        user = User.objects.create_user("new-sales", role="sales")
+        self.assertIsNone(directory.role_of(user.id))
+        expired = time.monotonic() + 61
+        with mock.patch("accounts.directory.time.monotonic",
+                        return_value=expired):
+            self.assertEqual(directory.role_of(user.id), "sales")
+
+    def test_invalidated_while_loading(self):
+        directory = UserDirectory(ttl=60)
+        rows = User.objects.values_list("id", "role")
+
+        def load(*fields):
+            directory.invalidate()
+            return rows
+
+        with mock.patch.object(User.objects, "values_list", load):
+            directory.warm()
+        with self.assertNumQueries(1):
+            directory.role_of(self.sales.id)
+
+
+class ClientSummaryTest(QueryCountTestCase):
+    """Summaries hold contract figures, which support contacts cannot read."""
+
+    def test_sales_contact(self):
+        Contract.objects.create(
+            client=self.crm_client, sales_contact=self.sales, amount=250,
+            payment_due="2030-01-01T00:00:00Z", status=True)
+        client = APIClient()
+        client.force_authenticate(self.sales)
+        response = client.get("/crm/v1/clients/summary/")
+        self.assertEqual(response.status_code, 200)
+        row, = response.json()["results"]
+        self.assertEqual((row["open_contracts"], row["signed_contracts"],
+                          row["signed_amount"]), (1, 1, 250))
+
+    def test_support_contact(self):
+        client = APIClient()
+        client.force_authenticate(self.support)
+        for by in ("client", "sales_contact"):
+            with self.subTest(by=by):
+                response = client.get("/crm/v1/clients/summary/",
+                                      {"by": by})
+                self.assertEqual(response.status_code, 403)
+                self.assertEqual(response.json()["detail"],
+                                 IsManagerOrContractSalesContact.message)
+
+
+class RollupTest(QueryCountTestCase):
+    """
+    Rollups kept up by the signals equal those the 0011 migration computes
+    from the rows, whatever happens to the contracts, events and notes.
+    """
+
+    def setUp(self):
+        self.other_client = self.create_client(self.sales)
+
+    def assertRecomputed(self):
+        kept = list(ClientRollup.objects.order_by("client_id").values())
+        ClientRollup.objects.all().delete()
+        importlib.import_module(
+            "crm.migrations.0011_client_rollups").populate_rollups(apps, None)
+        self.assertEqual(
+            kept, list(ClientRollup.objects.order_by("client_id").values()))
+
+    def test_contracts(self):
+        contract = Contract.objects.create(
+            client=self.crm_client, sales_contact=self.sales, amount=250,
+            payment_due="2030-01-01T00:00:00Z")
+        self.assertRecomputed()
+        contract.status = True
+        contract.save()
+        self.assertRecomputed()
+        contract.client = self.other_client
+        contract.amount = 300
+        contract.save()
+        self.assertRecomputed()
+        contract.status = False
+        contract.save()
+        self.assertRecomputed()
+        self.contract.delete()
+        contract.delete()
+        self.assertRecomputed()
+
+    def test_events_and_notes(self):
+        event = Event.objects.create(client=self.other_client,
+                                     support_contact=self.support,
+                                     attendees=5)
+        note = Note.objects.create(event=event, description="Catering")
+        self.assertRecomputed()
+        self.event.event_over = True
+        self.event.save()
+        self.assertRecomputed()
+        # Moves the event with its note to the other client.
+        self.event.client = self.other_client
+        self.event.save()
+        self.assertRecomputed()
+        note.event = self.event
+        note.save()
+        self.assertRecomputed()
+        note.delete()
+        event.delete()
+        self.assertRecomputed()
+        self.event.delete()
+        self.assertRecomputed()
+
+
+@override_settings(CRM_JOBS={"max_attempts": 3, "retry_delay": 10,
+                             "lease": 300})
+class JobTest(QueryCountTestCase):
+    """
+    Jobs of the outbox are leased to one worker at a time, retried with a
+    backoff when they fail, and kept as failed once out of attempts.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.dict(jobs.handlers, {"fail": self.fail_job})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def fail_job():
+        raise RuntimeError("Venue unreachable")
+
+    def test_claim(self):
+        job = jobs.enqueue("contract_signed", contract_id=self.contract.id,
+                           client_id=self.crm_client.id)
+        started = timezone.now()
+        self.assertEqual(jobs.claim(10), [job.id])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 1))
+        self.assertGreaterEqual(job.locked_until,
+                                started + datetime.timedelta(seconds=300))
+        # Leased to the first worker.
+        self.assertEqual(jobs.claim(10), [])
+
+        self.assertTrue(jobs.run(job.id))
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(Event.objects.filter(
+            client=self.crm_client).count(), 2)
+
+    def test_signing_paths(self):
+        data = {"client": self.crm_client.id, "amount": 100,
+                "payment_due": "2100-01-01T10:00", "status": True}
+        requests = (("put", f"/crm/v1/contracts/{self.contract.id}/", data),
+                    ("post", "/crm/v1/contracts/", data),
+                    ("post", "/crm/v1/contracts/bulk/", [data, data]))
+        for method, path, payload in requests:
+            with self.subTest(path=path):
+                Job.objects.all().delete()
+                response, _ = self.request(self.sales, method, path,
+                                           payload)
+                self.assertLess(response.status_code, 300, response.content)
+                contracts = response.json()
+                if not isinstance(contracts, list):
+                    contracts = [contracts]
+                self.assertEqual(
+                    sorted((job.name, job.payload["contract_id"],
+                            job.payload["client_id"])
+                           for job in Job.objects.all()),
+                    [("contract_signed", contract["id"], self.crm_client.id)
+                     for contract in contracts])
+        Job.objects.all().delete()
+        response, _ = self.request(self.sales, "post", "/crm/v1/contracts/",
+                                   {**data, "amount": "many"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+    def test_expired_lease(self):
+        job = jobs.enqueue("contract_signed", contract_id=self.contract.id,
+                           client_id=self.crm_client.id)
+        jobs.claim(10)
+        # The worker died before the end of its lease.
+        Job.objects.filter(id=job.id).update(
+            locked_until=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(jobs.claim(10), [job.id])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 2))
+
+    def run_failing(self, job, delay):
+        """Claims and runs a failing job, due again after delay seconds."""
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        self.assertEqual(jobs.claim(10), [job.id])
+        started = timezone.now()
+        self.assertFalse(jobs.run(job.id))
+        job.refresh_from_db()
+        self.assertIn("RuntimeError: Venue unreachable", job.last_error)
+        self.assertIsNone(job.locked_until)
+        if delay is not None:
+            self.assertEqual(job.status, Job.PENDING)
+            self.assertGreaterEqual(
+                job.run_after, started + datetime.timedelta(seconds=delay))
+            self.assertLess(job.run_after, started + datetime.timedelta(
+                seconds=2 * delay))
+            # Not due before its backoff.
+            self.assertEqual(jobs.claim(10), [])
+
+    def test_retry_then_fail(self):
+        job = jobs.enqueue("fail")
+        self.run_failing(job, 10)
+        self.run_failing(job, 20)
+        self.run_failing(job, None)
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        self.assertEqual(jobs.claim(10), [])
+
+
+class VisibilityIndexTest(QueryCountTestCase):
+    """
+    The visibility index follows every reassignment and deletion: its rows
+    are those of a full rebuild, and the scopes read through it match the
+    joins they replaced.
+    """
+
+    def setUp(self):
+        self.other_client = self.create_client(self.other_sales)
+        self.other_event = Event.objects.create(
+            client=self.other_client, support_contact=self.other_support,
+            attendees=20)
+        Note.objects.create(event=self.other_event, description="Stage")
+
+    def join_scopes(self, user):
+        """Conditions of the scopes of a user as joins, before the index."""
+        if user.role == "sales":
+            return {
+                Client: Q(sales_contact=user),
+                Event: Q(client__sales_contact=user),
+                Note: Q(event__client__sales_contact=user),
+                Change: (Q(sales_contact_id=user.id)
+                         | Q(previous_contact_id=user.id,
+                             resource__in=["clients", "contracts"])),
+            }
+        clients = Event.objects.filter(support_contact=user).values(
+            "client_id")
+        return {
+            Client: Q(id__in=clients),
+            Event: Q(support_contact=user),
+            Note: Q(event__support_contact=user),
+            Change: ~Q(resource="contracts") & (
+                Q(support_contact_id=user.id)
+                | Q(previous_contact_id=user.id, resource="events")
+                | Q(resource="clients", object_id__in=clients)),
+        }
+
+    def assertIndexed(self):
+        self.assertEqual(
+            sorted(Visibility.objects.values_list(
+                "role", "user_id", "client_id", "event_id")),
+            sorted(visibility.visibility_rows(Event)))
+        for user in (self.sales, self.other_sales, self.support,
+                     self.other_support):
+            for model, condition in self.join_scopes(user).items():
+                with self.subTest(user=user.username, model=model.__name__):
+                    self.assertEqual(
+                        sorted(model.objects.visible_to(user).values_list(
+                            "id", flat=True)),
+                        sorted(model.objects.filter(condition).values_list(
+                            "id", flat=True)))
+
+    def test_reassignments(self):
+        self.assertIndexed()
+        self.crm_client.sales_contact = self.other_sales
+        self.crm_client.save()
+        self.assertIndexed()
+        self.event.support_contact = self.other_support
+        self.event.save()
+        self.assertIndexed()
+        self.other_event.client = self.crm_client
+        self.other_event.save()
+        self.assertIndexed()
+        self.event.support_contact = None
+        self.event.save()
+        self.assertIndexed()
+
+    def test_deletions(self):
+        self.event.delete()
+        self.assertIndexed()
+        self.other_client.delete()
+        self.assertIndexed()
+        self.assertFalse(Visibility.objects.exists())
+
+
+class ChangeSequenceTest(TransactionTestCase):
+    """
+    Changes are numbered in commit order and without gaps, even when a
+    transaction commits after one which started later, so that a consumer
+    resuming from the last number it read misses none.
+    """
+
+    def commit(self, *ids):
+        """Commits the changes of a writer with ids taken earlier."""
+        Change.objects.bulk_create([
+            Change(id=pk, resource="clients", object_id=pk,
+                   action=Change.CREATE) for pk in ids])
+
+    def consume(self, since):
+        """Ids of the changes after since, and the last number read."""
+        rows = list(changes.pending(Change.objects.all(), since))
+        return [row.object_id for row in rows], (rows[-1].seq if rows
+                                                 else since)
+
+    def assertSequenced(self, commit_order):
+        rows = Change.objects.order_by("seq")
+        self.assertEqual([row.seq for row in rows],
+                         list(range(1, len(commit_order) + 1)))
+        self.assertEqual([row.object_id for row in rows], commit_order)
+
+    def test_interleaved_writers(self):
+        # Writer A takes ids 1 and 2, writer B ids 3 and 4, then 5 and 6:
+        # B commits first, and A's last transaction commits after B's.
+        self.commit(3, 4)
+        changes.sequence()
+        read, since = self.consume(0)
+        # Both commit before the next round, which sees a hole at 5.
+        self.commit(1, 2)
+        self.commit(6)
+        changes.sequence()
+        more, since = self.consume(since)
+        read += more
+        self.commit(5)
+        changes.sequence()
+        more, since = self.consume(since)
+        read += more
+
+        self.assertSequenced([3, 4, 1, 2, 6, 5])
+        self.assertEqual(read, [3, 4, 1, 2, 6, 5])
+        self.assertEqual(self.consume(since), ([], since))
+
+    @skipUnless(connection.vendor == "postgresql",
+                "SQLite lets one transaction write at a time.")
+    def test_concurrent_writers(self):
+        sales = User.objects.create_user("sales", role="sales")
+        inserted, release = threading.Event(), threading.Event()
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    QueryCountTestCase.create_client(sales)
+                    inserted.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=slow_writer)
+        writer.start()
+        inserted.wait(5)
+        fast = QueryCountTestCase.create_client(sales)
+        read, since = self.consume(0)
+        release.set()
+        writer.join()
+        slow = Client.objects.exclude(id=fast.id).get()
+        more, since = self.consume(since)
+
+        self.assertSequenced([fast.id, slow.id])
+        self.assertEqual(read + more, [fast.id, slow.id])
+
+
+class AsgiExportTest(QueryCountTestCase):
+    """
+    ASGI servers iterate streaming responses in their event loop, where the
+    ORM cannot run: exports and the change log must be read before the view
+    returns.
+    """
+
+    def setUp(self):
+        # Changes are numbered once committed, which tests never are.
+        changes.sequence()
+
+    async def get(self, path):
+        token = AccessToken.for_user(self.manager)
+        response = await AsyncClient().get(
+            path, AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).splitlines()
+
+    async def test_export(self):
+        rows = await self.get("/crm/v1/clients/export/?fields=id,company")
+        self.assertEqual(rows, [b"id,company",
+                                f"{self.crm_client.id},Analytical".encode()])
+
+    async def test_changes(self):
+        rows = await self.get("/crm/v1/changes/?since=0")
+        self.assertEqual(len(rows), 4)
+
+
+@override_settings(CRM_METRICS={**settings.CRM_METRICS, "sample_rate": 1})
+class LongPollTest(TransactionTestCase):
+    """
+    Waiting long polls hold no thread: concurrent polls, sampled by the
+    metrics middleware, wait side by side until a change of their events.
+    """
+
+    timeout = 1
+
+    def setUp(self):
+        self.support = User.objects.create_user("support", role="support")
+        self.token = AccessToken.for_user(self.support)
+
+    async def poll(self, client, since):
+        response = await client.get(
+            f"/crm/v1/async/events/updates/?since={since}"
+            f"&timeout={self.timeout}",
+            AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [])
+
+    async def test_concurrent_polls(self):
+        client = AsyncClient()
+        since = await asyncio.get_running_loop().run_in_executor(
+            None, push.last_seq)
+        started = time.monotonic()
+        await asyncio.gather(*(self.poll(client, since) for _ in range(5)))
+        self.assertLess(time.monotonic() - started, 2 * self.timeout)
+
+    @override_settings(CRM_LONG_POLL={"timeout": 30, "recheck": 30})
+    async def test_wake_up(self):
+        """A change wakes up its support contact only, without a re-read."""
+        loop = asyncio.get_running_loop()
+        other = await loop.run_in_executor(
+            None, lambda: User.objects.create_user("other-support",
+                                                   role="support"))
+        event = await loop.run_in_executor(None, self.create_event)
+        since = await loop.run_in_executor(None, push.last_seq)
+        client = AsyncClient()
+        woken = asyncio.ensure_future(client.get(
+            f"/crm/v1/async/events/updates/?since={since}&timeout=10",
+            AUTHORIZATION=f"Bearer {self.token}"))
+        waiting = asyncio.ensure_future(client.get(
+            f"/crm/v1/async/events/updates/?since={since}&timeout=2",
+            AUTHORIZATION=f"Bearer {AccessToken.for_user(other)}"))
+        await asyncio.sleep(0.5)
+
+        started = time.monotonic()
+        event.attendees = 80
+        await loop.run_in_executor(None, event.save)
+        response = await woken
+        self.assertLess(time.monotonic() - started, 1)
+        row, = response.json()["results"]
+        self.assertEqual((row["resource"], row["id"],
+                          row["data"]["attendees"]),
+                         ("events", event.id, 80))
+        self.assertEqual(response.json()["since"], row["seq"])
+        self.assertFalse(waiting.done())
+        self.assertEqual((await waiting).json()["results"], [])
+
+    def create_event(self):
+        sales = User.objects.create_user("sales", role="sales")
+        return Event.objects.create(
+            client=QueryCountTestCase.create_client(sales),
+            support_contact=self.support, attendees=10)
+
+
+class AsyncViewTest(TransactionTestCase):
+    """
+    The async mirrors answer like the regular endpoints, and run their views
+    side by side on their pool rather than one at a time.
+    """
+
+    def setUp(self):
+        self.sales = User.objects.create_user("sales", role="sales")
+        self.token = AccessToken.for_user(self.sales)
+        self.crm_client = QueryCountTestCase.create_client(self.sales)
+
+    async def get(self, path):
+        return await AsyncClient().get(path,
+                                       AUTHORIZATION=f"Bearer {self.token}")
+
+    async def test_same_responses(self):
+        api = APIClient()
+        api.force_authenticate(self.sales)
+        for path in ("/crm/v1/clients/",
+                     f"/crm/v1/clients/{self.crm_client.id}/",
+                     "/crm/v1/clients/999999/"):
+            with self.subTest(path=path):
+                response = await self.get(path.replace("/crm/v1/",
+                                                       "/crm/v1/async/"))
+                expected = await asyncio.get_running_loop().run_in_executor(
+                    None, api.get, path)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+    async def test_concurrent_views(self):
+        retrieve = ClientViewSet.retrieve
+
+        def slow_retrieve(view, request, pk=None):
+            time.sleep(0.5)
+            return retrieve(view, request, pk)
+
+        path = f"/crm/v1/async/clients/{self.crm_client.id}/"
+        with mock.patch.object(ClientViewSet, "retrieve", slow_retrieve):
+            started = time.monotonic()
+            responses = await asyncio.gather(*(self.get(path)
+                                               for _ in range(4)))
+            elapsed = time.monotonic() - started
+        self.assertEqual({response.status_code for response in responses},
+                         {200})
+        self.assertLess(elapsed, 1)
+
+
+@skipUnless(connection.vendor == "postgresql", "Needs a PostgreSQL server.")
+class ConnectionPoolTest(TestCase):
+    """
+    Pooled connections are checked and given back idle, in autocommit mode,
+    whatever the state the previous borrower left them in.
+    """
+
+    alias = "pool-test"
+
+    def setUp(self):
+        self.addCleanup(lambda: pools.pop(self.alias).close_idle())
+
+    def borrow(self):
+        settings_dict = {**connection.settings_dict, "CONN_MAX_AGE": 0,
+                         "CONN_HEALTH_CHECKS": True,
+                         "POOL": {"max_size": 1, "timeout": 1}}
+        wrapper = type(connection)(settings_dict, self.alias)
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def assertIdle(self, raw_connection):
+        from psycopg2 import extensions
+
+        self.assertEqual(raw_connection.info.transaction_status,
+                         extensions.TRANSACTION_STATUS_IDLE)
+
+    def test_check(self):
+        wrapper = self.borrow()
+        raw_connection = wrapper.connection
+        raw_connection.autocommit = False
+        self.assertTrue(wrapper.check_pooled(raw_connection))
+        self.assertIdle(raw_connection)
+
+    def test_release(self):
+        wrapper = self.borrow()
+        raw_connection = wrapper.connection
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        wrapper.close()
+        self.assertTrue(raw_connection.autocommit)
+        self.assertIdle(raw_connection)
+
+        wrapper = self.borrow()
+        self.assertIs(wrapper.connection, raw_connection)
+        self.assertIdle(raw_connection)
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            self.assertEqual(cursor.fetchone(), (1,))
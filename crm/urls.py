@@ -5,8 +5,12 @@ from rest_framework_nested import routers
 from rest_framework_simplejwt.views import (TokenObtainPairView,
                                             TokenRefreshView)
 
-from .views import (ClientViewSet, ContractViewSet, EventViewSet, NoteViewSet,
-                    UserViewSet)
+from accounts.authentication import RoleTokenObtainPairSerializer
+
+from . import async_views
+from .metrics import metrics_view
+from .views import (ChangeViewSet, ClientViewSet, ContractViewSet,
+                    EventViewSet, NoteViewSet, UserViewSet)
 
 router = SimpleRouter()
 
@@ -14,13 +18,29 @@ router.register("clients", ClientViewSet, basename="clients")
 router.register("contracts", ContractViewSet, basename="contracts")
 router.register("events", EventViewSet, basename="events")
 router.register("users", UserViewSet, basename="users")
+router.register("changes", ChangeViewSet, basename="changes")
 
 events_router = routers.NestedSimpleRouter(router, r"events", lookup="event")
 events_router.register(r"notes", NoteViewSet, basename="notes")
 
+async_urlpatterns = [
+    path("clients/", async_views.client_list),
+    path("clients/<int:pk>/", async_views.client_detail),
+    path("contracts/", async_views.contract_list),
+    path("contracts/<int:pk>/", async_views.contract_detail),
+    path("events/", async_views.event_list),
+    path("events/updates/", async_views.event_updates),
+    path("events/<int:pk>/", async_views.event_detail),
+    path("events/<int:event_pk>/notes/", async_views.note_list),
+    path("events/<int:event_pk>/notes/<int:pk>/", async_views.note_detail),
+]
+
 urlpatterns = [
-    path("login/", TokenObtainPairView.as_view(), name="login"),
+    path("login/", TokenObtainPairView.as_view(
+        serializer_class=RoleTokenObtainPairSerializer), name="login"),
     path("login/refresh", TokenRefreshView.as_view(), name="refresh"),
+    path("async/", include(async_urlpatterns)),
+    path("_metrics", metrics_view, name="metrics"),
     url(r"^", include(router.urls)),
     url(r"^", include(events_router.urls)),
 ]
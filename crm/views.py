@@ -1,14 +1,31 @@
 from datetime import datetime
 
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django_filters import rest_framework as filters
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from accounts.directory import user_directory
 from accounts.models import User
 
+from . import changes, jobs, push, rollups
+from .analytics import BUCKETS, DATE_FIELDS, DIMENSIONS, contract_analytics
+from .cache import list_cache
+from .compiled import compile_serializer
+
+from .conditional import (
+    detail_validators,
+    list_validators,
+    not_modified,
+    set_validators
+)
+
 from .exceptions import (
     CannotCreateClient,
     CannotCreateNote,
@@ -16,6 +33,7 @@ from .exceptions import (
     ContractAlreadySigned,
     ContractMustBeSigned,
     EventOver,
+    InvalidBulkPayload,
     NotInChargeOfClient,
     NotInChargeOfContract,
     NotInChargeOfEvent,
@@ -24,6 +42,10 @@ from .exceptions import (
     ObsoleteDate
 )
 
+from .export import stream_export
+
+from .fieldsets import requested_fields
+
 from .filters import (
     ClientFilter,
     ContractFilter,
@@ -32,18 +54,35 @@ from .filters import (
     UserFilter
 )
 
-from .models import Client, Contract, Event, Note
+from .metrics import TimedViewMixin, timed
+
+from .models import Change, Client, Contract, Event, Note
+
+from .pagination import (
+    ClientPagination,
+    ContractPagination,
+    EventPagination,
+    NotePagination
+)
 
 from .permissions import (
     IsManager,
     IsManagerOrClientSalesContact,
     IsManagerOrContractSalesContact,
     IsManagerOrEventSupportContact,
-    IsManagerOrSupportContact
+    IsManagerOrSupportContact,
+    IsSupport
 )
 
+from .renderers import render_json
+
+from .routers import ReplicaRoutingMixin
+
 from .serializers import (
+    ClientBulkSerializer,
     ClientSerializer,
+    ClientSummarySerializer,
+    ContractBulkSerializer,
     ContractSerializer,
     EventSerializer,
     NoteSerializer,
@@ -63,7 +102,129 @@ def check_date(string):
         raise ObsoleteDate()
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+def to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_bulk_payload(items):
+    if (not isinstance(items, list) or not items
+            or len(items) > settings.CRM_BULK_MAX_SIZE):
+        raise InvalidBulkPayload()
+
+
+def bulk_validate(serializer_class, items):
+    """
+    Validates every item of a bulk request. Returns the validated data and
+    the errors of each item, an empty dict standing for a valid item.
+    """
+    validated, errors = [], []
+    for item in items:
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            validated.append(serializer.validated_data)
+            errors.append({})
+        else:
+            validated.append(None)
+            errors.append(dict(serializer.errors))
+    return validated, errors
+
+
+def item_value(item, key):
+    return item.get(key) if isinstance(item, dict) else None
+
+
+def non_negative_integer(params, name, default):
+    """Integer query parameter, at least 0."""
+    if name not in params:
+        return default
+    value = to_id(params[name])
+    if value is None or value < 0:
+        raise ValidationError(
+            {name: ["A valid non-negative integer is required."]})
+    return value
+
+
+def poll_timeout(params):
+    """
+    Seconds a long poll waits for an update, CRM_LONG_POLL["timeout"] at
+    most.
+    """
+    longest = settings.CRM_LONG_POLL["timeout"]
+    return min(non_negative_integer(params, "timeout", longest), longest)
+
+
+class ScopedListMixin:
+    """
+    Lists the role-scoped queryset of get_list_queryset, answering from the
+    list cache or with a 304 response whenever possible.
+    """
+
+    list_resource = None
+
+    def paginated_list(self, queryset, serializer_class, fields):
+        """
+        Page of the queryset with the given fields, or all of them, rendered
+        from values_list() rows when the serializer compiles.
+        """
+        compiled = compile_serializer(serializer_class, fields)
+        if compiled is None:
+            page = self.paginate_queryset(queryset)
+            results = serializer_class(page, many=True).data
+            if fields is not None:
+                results = [{name: row[name] for name in fields}
+                           for row in results]
+            return self.get_paginated_response(results).data
+
+        # Selects the rendered columns and those of the cursor only.
+        ordering = [name.lstrip("-") for name in
+                    self.paginator.get_ordering_fields(queryset)]
+        extra = [name for name in ordering if name not in compiled.columns]
+        page = self.paginate_queryset(queryset.values_list(
+            *compiled.columns, *extra, named=True))
+        with timed("serializer"):
+            results = compiled.render(page)
+        return self.get_paginated_response(results).data
+
+    def scoped_list(self, request, serializer_class, **kwargs):
+        fields = requested_fields(request, serializer_class)
+        key = list_cache.key(request, self.list_resource)
+        cached = list_cache.get(key)
+        if cached is None:
+            queryset = self.get_list_queryset(request, **kwargs)
+            data = render_json(self.paginated_list(queryset,
+                                                   serializer_class, fields))
+            etag = list_validators(request, data)
+            list_cache.set(key, (data, etag))
+        else:
+            data, etag = cached
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        return set_validators(Response(data), etag)
+
+
+class ChangeViewSet(TimedViewMixin, ReplicaRoutingMixin, viewsets.ViewSet):
+    """
+    A ViewSet streaming the changes of the clients, contracts, events and
+    notes a user can read, for incremental synchronization.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request):
+        params = request.query_params
+        since = non_negative_integer(params, "since", 0)
+        limit = non_negative_integer(params, "limit", None)
+        queryset = Change.objects.visible_to(request.user)
+        return changes.stream_changes(request, queryset, since, limit)
+
+
+class ClientViewSet(TimedViewMixin, ReplicaRoutingMixin, ScopedListMixin,
+                    viewsets.ModelViewSet):
     """
     A ViewSet to list, retrieve, create and update clients.
     """
@@ -76,45 +237,62 @@ class ClientViewSet(viewsets.ModelViewSet):
     )
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = ClientFilter
+    pagination_class = ClientPagination
+    list_resource = "clients"
 
-    def list(self, request):
-        user = self.request.user
-        queryset = Client.objects.all()
-        if user.role == "sales":
-            queryset = queryset.filter(sales_contact=user)
-        elif user.role == "support":
-            events = Event.objects.filter(support_contact=user)
-            events_clients = [event.client.id for event in events]
-            queryset = Client.objects.filter(id__in=events_clients)
+    def get_list_queryset(self, request):
+        queryset = Client.objects.visible_to(request.user)
+        return self.filter_queryset(queryset)
 
-        queryset = self.filter_queryset(queryset).order_by("last_name")
-        serializer = ClientSerializer(queryset, many=True)
-        return Response(serializer.data)
+    def list(self, request):
+        return self.scoped_list(request, ClientSerializer)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        queryset = self.get_list_queryset(request).order_by(
+            *self.paginator.get_ordering())
+        return stream_export(request, queryset, ClientSerializer,
+                             request.query_params.get("file_format", "csv"),
+                             "clients",
+                             requested_fields(request, ClientSerializer))
+
+    # Contract figures: read like the contracts.
+    @action(detail=False, methods=["get"],
+            permission_classes=(IsAuthenticated,
+                                IsManagerOrContractSalesContact))
+    def summary(self, request):
+        queryset = self.get_list_queryset(request)
+        group_by = request.query_params.get("by", "client")
+        if group_by == "sales_contact":
+            return Response(list(rollups.sales_contact_summary(queryset)))
+        if group_by != "client":
+            raise ValidationError(
+                {"by": ["Choose one of: client, sales_contact."]})
+        page = self.paginate_queryset(queryset.select_related("rollup"))
+        serializer = ClientSummarySerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def retrieve(self, request, pk=None):
         user = request.user
-        client = get_object_or_404(Client, id=pk)
-        queryset = Client.objects.filter(id=pk)
-        if user.role == "sales":
-            queryset = queryset.filter(sales_contact=user)
-        elif user.role == "support":
-            events = Event.objects.filter(support_contact=user)
-            events_clients = [event.client.id for event in events]
-            queryset = Client.objects.filter(id__in=events_clients, id=pk)
-        if client is not None and queryset.count() == 0:
+        client = get_object_or_404(Client.objects.with_visibility(user),
+                                   id=pk)
+        if not client.is_visible:
             raise NotInChargeOfClient()
 
+        etag, last_modified = detail_validators(client)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
         serializer = ClientSerializer(client)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
 
     def create(self, request):
         user = request.user
         request_copy = request.data.copy()
         if user.role == "management":
-            sales_contact = request_copy["sales_contact"]
-            sales_contact = User.objects.filter(id=sales_contact,
-                                                role="sales")
-            if sales_contact.count() == 0:
+            sales_contact = to_id(request_copy["sales_contact"])
+            if not user_directory.has_role(sales_contact, "sales"):
                 raise NotSalesMember()
         elif user.role == "sales":
             request_copy["sales_contact"] = user.id
@@ -129,9 +307,8 @@ class ClientViewSet(viewsets.ModelViewSet):
     def update(self, request, pk=None):
         client = get_object_or_404(Client, id=pk)
         if "sales_contact" in request.data.keys():
-            sales_contact = request.data["sales_contact"]
-            sales_contact = User.objects.filter(id=sales_contact, role="sales")
-            if sales_contact.count() == 0:
+            sales_contact = to_id(request.data["sales_contact"])
+            if not user_directory.has_role(sales_contact, "sales"):
                 raise NotSalesMember()
 
         self.check_object_permissions(request, client)
@@ -140,8 +317,44 @@ class ClientViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data)
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        user = request.user
+        items = request.data
+        check_bulk_payload(items)
+        if user.role not in ("management", "sales"):
+            raise CannotCreateClient()
+
+        validated, errors = bulk_validate(ClientBulkSerializer, items)
+        if user.role == "management":
+            requested = [to_id(item_value(item, "sales_contact"))
+                         for item in items]
+            sales_ids = user_directory.members("sales")
+            for index, sales_contact in enumerate(requested):
+                if sales_contact not in sales_ids:
+                    errors[index]["sales_contact"] = [
+                        NotSalesMember.default_detail]
+        else:
+            requested = [user.id] * len(items)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            clients = Client.objects.bulk_create([
+                Client(sales_contact_id=sales_contact, **data)
+                for data, sales_contact in zip(validated, requested)
+            ])
+            # Also gives their ids to the clients, on every database.
+            changes.record_created(clients)
+            rollups.create_empty(client.id for client in clients)
+        # bulk_create sends no post_save signal.
+        list_cache.invalidate(["clients"], requested)
+        serializer = ClientSerializer(clients, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
-class ContractViewSet(viewsets.ModelViewSet):
+class ContractViewSet(TimedViewMixin, ReplicaRoutingMixin, ScopedListMixin,
+                      viewsets.ModelViewSet):
     """
     A ViewSet to list, retrieve, create and update contracts.
     """
@@ -154,27 +367,62 @@ class ContractViewSet(viewsets.ModelViewSet):
     )
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = ContractFilter
+    pagination_class = ContractPagination
+    list_resource = "contracts"
 
-    def list(self, request):
-        user = self.request.user
-        queryset = Contract.objects.all()
-        if user.role == "sales":
-            queryset = queryset.filter(sales_contact=user)
+    def get_list_queryset(self, request):
+        queryset = Contract.objects.visible_to(request.user)
+        return self.filter_queryset(queryset)
 
-        queryset = self.filter_queryset(queryset).order_by("id")
-        serializer = ContractSerializer(queryset, many=True)
-        return Response(serializer.data)
+    def list(self, request):
+        return self.scoped_list(request, ContractSerializer)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        queryset = self.get_list_queryset(request).order_by(
+            *self.paginator.get_ordering())
+        return stream_export(request, queryset, ContractSerializer,
+                             request.query_params.get("file_format", "csv"),
+                             "contracts",
+                             requested_fields(request, ContractSerializer))
+
+    @action(detail=False, methods=["get"])
+    def analytics(self, request):
+        params = request.query_params
+        dimensions = [name for name in params.get("group_by", "").split(",")
+                      if name]
+        bucket = params.get("bucket")
+        date_field = params.get("date_field", "payment_due")
+        errors = {}
+        if any(name not in DIMENSIONS for name in dimensions):
+            errors["group_by"] = [f"Choose among: {', '.join(DIMENSIONS)}."]
+        if bucket is not None and bucket not in BUCKETS:
+            errors["bucket"] = [f"Choose one of: {', '.join(BUCKETS)}."]
+        if date_field not in DATE_FIELDS:
+            errors["date_field"] = [
+                f"Choose one of: {', '.join(DATE_FIELDS)}."]
+        if errors:
+            raise ValidationError(errors)
+
+        rows = contract_analytics(self.get_list_queryset(request),
+                                  list(dict.fromkeys(dimensions)), bucket,
+                                  date_field)
+        return Response(rows)
 
     def retrieve(self, request, pk=None):
         user = request.user
-        contract = get_object_or_404(Contract, id=pk)
-        if user.role == "sales":
-            queryset = Contract.objects.filter(id=pk, sales_contact=user)
-            if contract is not None and queryset.count() == 0:
-                raise NotInChargeOfContract()
+        contract = get_object_or_404(
+            Contract.objects.with_visibility(user), id=pk)
+        if not contract.is_visible:
+            raise NotInChargeOfContract()
+
+        etag, last_modified = detail_validators(contract)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
 
         serializer = ContractSerializer(contract)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
 
     def create(self, request, pk=None):
         user = request.user
@@ -186,13 +434,9 @@ class ContractViewSet(viewsets.ModelViewSet):
             request_copy["sales_contact"] = client.sales_contact.id
         elif user.role == "sales":
             request_copy["sales_contact"] = user.id
-            user_clients = Client.objects.filter(sales_contact=request.user.id)
-            clients_id = [client.id for client in user_clients]
-            if int(request_copy["client"]) not in clients_id:
+            user_clients = Client.objects.visible_to(user)
+            if not user_clients.filter(id=request_copy["client"]).exists():
                 raise NotInChargeOfClient()
-        if "status" in request_copy.keys():
-            new_event = Event(client=client, attendees=0)
-            new_event.save()
 
         if "payment_due" in request_copy.keys():
             if len(request_copy["payment_due"]) > 1:
@@ -200,7 +444,9 @@ class ContractViewSet(viewsets.ModelViewSet):
 
         serializer = ContractSerializer(data=request_copy)
         serializer.is_valid(raise_exception=True)
-        serializer.save(sales_contact=user)
+        # The signing jobs are saved with the contract.
+        with transaction.atomic():
+            serializer.save(sales_contact=user)
         return Response(serializer.data,
                         status=status.HTTP_201_CREATED)
 
@@ -210,9 +456,6 @@ class ContractViewSet(viewsets.ModelViewSet):
         if contract.status:
             raise ContractAlreadySigned()
         request_copy = request.data.copy()
-        if "status" in request_copy.keys():
-            new_event = Event(client=contract.client, attendees=0)
-            new_event.save()
         if user.role == "management":
             client = request_copy["client"]
             client = get_object_or_404(Client, id=client)
@@ -228,11 +471,51 @@ class ContractViewSet(viewsets.ModelViewSet):
         self.check_object_permissions(request, contract)
         serializer = ContractSerializer(contract, data=request_copy)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
         return Response(serializer.data)
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        user = request.user
+        items = request.data
+        check_bulk_payload(items)
+
+        validated, errors = bulk_validate(ContractBulkSerializer, items)
+        requested = [to_id(item_value(item, "client")) for item in items]
+        clients = Client.objects.visible_to(user).in_bulk(
+            [pk for pk in requested if pk is not None])
+        for index, (data, client) in enumerate(zip(validated, requested)):
+            if client not in clients:
+                errors[index]["client"] = [
+                    NotInChargeOfClient.default_detail
+                    if user.role == "sales" else "Client not found."
+                ]
+            if data is not None and data["payment_due"] < aware_date:
+                errors[index]["payment_due"] = [ObsoleteDate.default_detail]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            contracts = Contract.objects.bulk_create([
+                Contract(client=clients[client], sales_contact=user, **data)
+                for data, client in zip(validated, requested)
+            ])
+            changes.record_created(contracts)
+            jobs.enqueue_many("contract_signed", [
+                {"contract_id": contract.id,
+                 "client_id": contract.client_id}
+                for contract in contracts if contract.status
+            ])
+            rollups.add_rows(contracts)
+        # bulk_create sends no post_save signal.
+        list_cache.invalidate(["contracts"], [user.id])
+        serializer = ContractSerializer(contracts, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(TimedViewMixin, ReplicaRoutingMixin, ScopedListMixin,
+                   viewsets.ModelViewSet):
     """
     A ViewSet to list, create, retrieve and update events.
     """
@@ -245,45 +528,69 @@ class EventViewSet(viewsets.ModelViewSet):
     )
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = EventFilter
+    pagination_class = EventPagination
+    list_resource = "events"
 
-    def list(self, request):
-        user = self.request.user
-        queryset = Event.objects.all()
-        if user.role == "sales":
-            queryset = queryset.filter(client__sales_contact=user)
-        elif user.role == "support":
-            queryset = queryset.filter(support_contact=user)
+    def get_list_queryset(self, request):
+        queryset = Event.objects.visible_to(request.user)
+        return self.filter_queryset(queryset)
 
-        queryset = self.filter_queryset(queryset).order_by("event_date")
-        serializer = EventSerializer(queryset, many=True)
-        return Response(serializer.data)
+    def list(self, request):
+        return self.scoped_list(request, EventSerializer)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        queryset = self.get_list_queryset(request).order_by(
+            *self.paginator.get_ordering())
+        return stream_export(request, queryset, EventSerializer,
+                             request.query_params.get("file_format", "csv"),
+                             "events",
+                             requested_fields(request, EventSerializer))
+
+    @action(detail=False, methods=["get"],
+            permission_classes=(IsAuthenticated, IsSupport))
+    def updates(self, request):
+        """
+        Changes of the events of a support contact after since, returned
+        without waiting: a waiting request would hold a thread of the WSGI
+        server. The async view polls it, awaiting the broker in between.
+        """
+        params = request.query_params
+        since = non_negative_integer(params, "since", None)
+        if since is None:
+            since = push.last_seq()
+        limit = min(non_negative_integer(params, "limit",
+                                         settings.CRM_MAX_PAGE_SIZE),
+                    settings.CRM_MAX_PAGE_SIZE)
+        # Checked for the async view, which waits for up to timeout.
+        poll_timeout(params)
+        return Response(push.page(push.updates(request.user, since, limit),
+                                  since))
 
     def create(self, request):
         raise ContractMustBeSigned()
 
     def retrieve(self, request, pk=None):
         user = request.user
-        event = get_object_or_404(Event, id=pk)
-        queryset = Event.objects.filter(id=pk)
-        if user.role == "sales":
-            queryset = queryset.filter(client__sales_contact=user)
-        elif user.role == "support":
-            queryset = queryset.filter(support_contact=user)
-        if event is not None and queryset.count() == 0:
+        event = get_object_or_404(Event.objects.with_visibility(user), id=pk)
+        if not event.is_visible:
             raise NotInChargeOfEvent()
 
+        etag, last_modified = detail_validators(event)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
         serializer = EventSerializer(event)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
 
     def update(self, request, pk=None):
         user = request.user
         event = get_object_or_404(Event, id=pk)
         request_copy = request.data.copy()
         if user.role == "management":
-            support_contact_id = request.data["support_contact"]
-            support_contact = User.objects.filter(id=support_contact_id)
-            support_contact = support_contact.first()
-            if support_contact.role != "support":
+            support_contact_id = to_id(request.data["support_contact"])
+            if not user_directory.has_role(support_contact_id, "support"):
                 raise NotSupportMember()
             else:
                 request_copy["client"] = event.client.id
@@ -313,7 +620,8 @@ class EventViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(TimedViewMixin, ReplicaRoutingMixin, ScopedListMixin,
+                  viewsets.ModelViewSet):
     """
     A ViewSet to list, retrieve and create notes.
     """
@@ -326,58 +634,82 @@ class NoteViewSet(viewsets.ModelViewSet):
     )
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = NoteFilter
+    pagination_class = NotePagination
+    list_resource = "notes"
 
-    def list(self, request, event_pk=None):
-        user = request.user
-        event = get_object_or_404(Event, id=event_pk)
-        events = Event.objects.filter(id=event_pk)
-        queryset = Note.objects.filter(event_id=event_pk)
-        if user.role == "sales":
-            events = events.filter(client__sales_contact=user)
-            queryset = queryset.filter(event__client__sales_contact=user)
-        elif user.role == "support":
-            queryset = queryset.filter(event__support_contact=user)
-            events = events.filter(support_contact=user)
-        if event is not None and events.count() == 0:
+    def get_list_queryset(self, request, event_pk):
+        event = get_object_or_404(
+            Event.objects.with_visibility(request.user), id=event_pk)
+        if not event.is_visible:
             raise NotInChargeOfEvent()
+        # Notes are visible through their event, checked above.
+        queryset = Note.objects.filter(event_id=event_pk)
+        return self.filter_queryset(queryset)
 
-        queryset = self.filter_queryset(queryset).order_by("id")
-        serializer = NoteSerializer(queryset, many=True)
-        return Response(serializer.data)
+    def list(self, request, event_pk=None):
+        return self.scoped_list(request, NoteSerializer, event_pk=event_pk)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request, event_pk=None):
+        queryset = self.get_list_queryset(request, event_pk).order_by(
+            *self.paginator.get_ordering())
+        return stream_export(request, queryset, NoteSerializer,
+                             request.query_params.get("file_format", "csv"),
+                             f"event_{event_pk}_notes",
+                             requested_fields(request, NoteSerializer))
 
     def retrieve(self, request, event_pk=None, pk=None):
         user = request.user
-        event = get_object_or_404(Event, id=event_pk)
-        note = get_object_or_404(Note, id=pk, event_id=event_pk)
-        queryset = Note.objects.filter(id=pk, event_id=event_pk)
-        if user.role == "sales":
-            queryset = queryset.filter(event__client__sales_contact=user)
-        elif user.role == "support":
-            queryset = queryset.filter(event__support_contact=user)
-        if event is not None and queryset.count() == 0:
+        note = get_object_or_404(Note.objects.with_visibility(user),
+                                 id=pk, event_id=event_pk)
+        if not note.is_visible:
             raise NotInChargeOfEvent()
 
         serializer = NoteSerializer(note)
         return Response(serializer.data)
 
-    def create(self, request, event_pk=None):
-        user = request.user
-        event = get_object_or_404(Event, id=event_pk)
+    def get_writable_event(self, user, event_pk):
+        event = get_object_or_404(Event.objects.with_visibility(user),
+                                  id=event_pk)
         if user.role == "sales":
             raise CannotCreateNote()
         elif user.role == "support":
-            queryset = Event.objects.filter(id=event_pk,
-                                            support_contact=user)
-            if event is not None and queryset.count() == 0:
+            if not event.is_visible:
                 raise NotInChargeOfEvent()
             if event.event_over:
                 raise EventOver()
+        return event
 
+    def create(self, request, event_pk=None):
+        event = self.get_writable_event(request.user, event_pk)
         serializer = NoteSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(event=event)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request, event_pk=None):
+        event = self.get_writable_event(request.user, event_pk)
+        items = request.data
+        check_bulk_payload(items)
+
+        validated, errors = bulk_validate(NoteSerializer, items)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            notes = Note.objects.bulk_create([
+                Note(event=event, **data) for data in validated
+            ])
+            changes.record_created(notes, (event.client.sales_contact_id,
+                                           event.support_contact_id))
+            rollups.add(event.client_id, {"notes": len(notes)})
+        # bulk_create sends no post_save signal.
+        list_cache.invalidate(["notes"], [event.support_contact_id,
+                                          event.client.sales_contact_id])
+        serializer = NoteSerializer(notes, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def update(self, request, event_pk=None, pk=None):
         user = request.user
         note = get_object_or_404(Note, event_id=event_pk,
@@ -404,7 +736,8 @@ class NoteViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(TimedViewMixin, ReplicaRoutingMixin,
+                  viewsets.ModelViewSet):
     """
     A ViewSet to update users.
     """
@@ -0,0 +1,63 @@
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Event, Visibility
+
+
+def visibility_rows(event_model, event_ids=None):
+    """
+    Role, user, client and event of the visibility rows of some events, of
+    every event by default.
+    """
+    events = event_model.objects.order_by()
+    if event_ids is not None:
+        events = events.filter(id__in=event_ids)
+    contacts = (
+        ("sales", "client__sales_contact_id"),
+        ("support", "support_contact_id"),
+    )
+    for role, contact in contacts:
+        rows = events.filter(**{f"{contact}__isnull": False}).values_list(
+            contact, "client_id", "id")
+        for user_id, client_id, event_id in rows.iterator():
+            yield role, user_id, client_id, event_id
+
+
+def insert(rows, batch_size=2000):
+    count = 0
+    while True:
+        batch = [Visibility(role=role, user_id=user_id, client_id=client_id,
+                            event_id=event_id)
+                 for role, user_id, client_id, event_id
+                 in islice(rows, batch_size)]
+        if not batch:
+            return count
+        Visibility.objects.bulk_create(batch)
+        count += len(batch)
+
+
+def index_event(event):
+    """Replaces the rows of an event, once created or reassigned."""
+    Visibility.objects.filter(event_id=event.pk).delete()
+    insert(visibility_rows(Event, [event.pk]))
+
+
+def index_client(client):
+    """Moves the sales rows of the events of a client to its new contact."""
+    Visibility.objects.filter(client_id=client.pk, role="sales").delete()
+    if client.sales_contact_id is None:
+        return
+    Visibility.objects.bulk_create([
+        Visibility(role="sales", user_id=client.sales_contact_id,
+                   client_id=client.pk, event_id=event_id)
+        for event_id in Event.objects.filter(client_id=client.pk).values_list(
+            "id", flat=True)
+    ])
+
+
+def rebuild(batch_size=2000):
+    """Recomputes every visibility row from the clients and events."""
+    with transaction.atomic():
+        Visibility.objects.all().delete()
+        return insert(visibility_rows(Event), batch_size)